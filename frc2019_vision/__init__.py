@@ -40,19 +40,6 @@ class OverwritingLifoQueue(queue.LifoQueue):
         self._put(item)
 
 
-class FrameQueue(queue.LifoQueue):
-    def _get(self):
-        return self.queue[-1]
-
-    def put(self, item):
-        if self.full():
-            try:
-                del self.queue[0]
-            except Exception:
-                pass
-        self._put(item)
-
-
 class StoppableThread(threading.Thread):
     """Thread class with a stop() method. The thread itself has to check
     regularly for the stopped() condition."""
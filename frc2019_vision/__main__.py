@@ -1,8 +1,11 @@
 import argparse
+import signal
 import sys
 
-from . import args, threads
+from . import args, logs, threads
 from .events import handler
+from .vision.constants import CALIBRATION_FILE_LOCATION
+from .vision.pipeline import CORNER_METHODS, POSE_MODES, POSE_SOLVERS
 
 
 def main():
@@ -12,20 +15,137 @@ def main():
         "-g", "--gui", action="store_true", help="tell application to display a window"
     )
     ap.add_argument("-c", "--camera", type=int, default=0, help="specify camera port")
+    ap.add_argument(
+        "-s",
+        "--source",
+        type=str,
+        default=None,
+        help="read frames from camera:N, video:FILE, images:DIR or recording:FILE "
+        "instead of the camera",
+    )
+    ap.add_argument(
+        "--fast",
+        action="store_true",
+        help="play the source back as fast as possible instead of in real time",
+    )
+    ap.add_argument(
+        "--loop", action="store_true", help="restart the source when it runs out"
+    )
     ap.add_argument(
         "-n", "--netiface", type=str, default="eth0", help="specify network interface"
     )
+    ap.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=0,
+        help="number of vision worker processes (0 runs vision on a single thread)",
+    )
+    ap.add_argument(
+        "-p",
+        "--pyramid",
+        type=int,
+        choices=(1, 2, 4),
+        default=1,
+        help="search for targets at 1/N resolution, refining at full resolution. "
+        "At 4 tape a few pixels wide is missed more often, in noisy images",
+    )
+    ap.add_argument(
+        "--threshold",
+        choices=("hsv", "lut"),
+        default="hsv",
+        help="threshold with cvtColor + inRange or a cached BGR lookup table",
+    )
+    ap.add_argument(
+        "--roi",
+        action="store_true",
+        help="only search around the last tape pair found, GET targets then "
+        "misses targets outside of it",
+    )
+    ap.add_argument(
+        "--roi-misses",
+        type=int,
+        default=3,
+        metavar="N",
+        help="search the whole frame again after N frames without the pair",
+    )
+    ap.add_argument(
+        "--corners",
+        choices=CORNER_METHODS,
+        default="extreme",
+        help="how the tape pipeline picks the corners of each tape",
+    )
+    ap.add_argument(
+        "--pose",
+        choices=POSE_MODES,
+        default="target",
+        help="solve each tape on its own or the whole target at once",
+    )
+    ap.add_argument(
+        "--pose-solver",
+        choices=POSE_SOLVERS,
+        default="ippe",
+        help="solver for --pose target",
+    )
+    ap.add_argument(
+        "--max-reprojection-error",
+        type=float,
+        default=None,
+        metavar="PX",
+        help="drop poses reprojecting further than PX from the tape corners",
+    )
+    ap.add_argument(
+        "--calibration",
+        type=args.calibration,
+        default=CALIBRATION_FILE_LOCATION,
+        metavar="FILE",
+        help="camera calibration, .npz or a legacy pickle",
+    )
+    ap.add_argument(
+        "--coast",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="keep predicting the target's position for this long after losing it",
+    )
+    ap.add_argument(
+        "-r",
+        "--record",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="record every processed frame and its result to FILE",
+    )
+    ap.add_argument(
+        "-t",
+        "--timings",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="time every pipeline stage and write the stats to FILE on exit",
+    )
+    ap.add_argument(
+        "--log-level",
+        choices=logs.LEVELS,
+        default="warning",
+        help="least severe messages to log, debug logs every RIO command",
+    )
     args.parse_args(vars(ap.parse_args()))
 
     handler.index()
 
-    threads.create()
-    threads.start()
-
-
-if __name__ == "__main__":
+    # stop the same way on kill as on Ctrl-C, here rather than under
+    # __name__ == "__main__" so the vision-2019 entry point stops too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
-        main()
+        threads.create()
+        threads.start()
+        threads.wait()
     except KeyboardInterrupt:
+        pass
+    finally:
         threads.stop()
-        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,33 @@
-from . import Target, environment
+import argparse
+
+from . import Target, environment, logs
+from .vision.calibration import load_calibration
+from .vision.timing import TIMINGS
 
 
 def parse_args(args: vars):
     environment.TARGET.put(args["target"])
     environment.GUI = args["gui"]
     environment.CAMERA_PORT = args["camera"]
+    environment.SOURCE = args["source"]
+    environment.REALTIME = not args["fast"]
+    environment.LOOP = args["loop"]
     environment.NETIFACE = args["netiface"]
+    environment.VISION_WORKERS = args["workers"]
+    environment.PYRAMID_SCALE = args["pyramid"]
+    environment.LUT = args["threshold"] == "lut"
+    environment.ROI = args["roi"]
+    environment.ROI_MISSES = args["roi_misses"]
+    environment.CORNER_METHOD = args["corners"]
+    environment.POSE_MODE = args["pose"]
+    environment.POSE_SOLVER = args["pose_solver"]
+    environment.MAX_REPROJECTION_ERROR = args["max_reprojection_error"]
+    environment.TRACKER.coast_time = args["coast"]
+    environment.CALIBRATION = (args["calibration"], 0)
+    environment.RECORD_FILE = args["record"]
+    environment.TIMINGS_FILE = args["timings"]
+    TIMINGS.enabled = args["timings"] is not None
+    logs.configure(args["log_level"])
 
 
 def target(arg: str):
@@ -14,3 +36,13 @@ def target(arg: str):
         if arg == target.value:
             return target
     return Target.NONE
+
+
+def calibration(arg: str) -> str:
+    # loaded here so a bad file stops us before any thread starts, the pipelines
+    # then get it from the cache
+    try:
+        load_calibration(arg)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError("can't load {}: {}".format(arg, e))
+    return arg
@@ -0,0 +1,394 @@
+"""Offline throughput benchmark for the vision pipelines.
+
+Feeds a video, a directory of images, a recording or synthetic scenes through the
+pipelines as fast as possible and prints the results as JSON, so runs can be
+compared across commits. Synthetic scenes come with ground truth, so their runs
+also report the pose error. Needs neither a camera nor a display.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from typing import Dict, Iterator, List
+
+import cv2
+import numpy as np
+
+from . import sources
+from .vision import constants, pipeline
+from .vision.synthetic import SceneGenerator
+from .vision.timing import TIMINGS
+
+
+def read_frames(path: str) -> Iterator[np.array]:
+    """Yield every frame of a video file, image directory or recording."""
+    return sources.from_path(path, realtime=False).frames()
+
+
+def synthetic_frames(count: int, seed: int = 0, **kwargs) -> Iterator[tuple]:
+    """Yield ``(image, targets)`` pairs of synthetic scenes and their truth."""
+    generator = SceneGenerator(
+        pipeline.load_calibration_results(constants.CALIBRATION_FILE_LOCATION),
+        seed=seed,
+        **kwargs
+    )
+    for frame in generator.frames(count):
+        yield frame.image, frame.targets
+
+
+def workspaces(vision_pipeline) -> list:
+    """Every ``Workspace`` a pipeline keeps its scratch buffers in."""
+    found = [vision_pipeline.workspace]
+    if vision_pipeline.threshold is not None:
+        found.append(vision_pipeline.threshold.workspace)
+    return found
+
+
+def tape_runner(
+    calib_fname: str = constants.CALIBRATION_FILE_LOCATION,
+    track_roi: bool = False,
+    **options
+):
+    """``options`` are passed on to the ``TapePipeline``."""
+    tape_pipeline = pipeline.TapePipeline(
+        calib_fname=calib_fname, track_roi=track_roi, **options
+    )
+
+    def run(frame):
+        _, distance, angle, offset = tape_pipeline.measure(frame)
+        return None if distance is None else (distance, angle, offset)
+
+    run.workspaces = workspaces(tape_pipeline)
+    return run
+
+
+def ball_runner(scale: int = 1, lut: bool = False):
+    ball_pipeline = pipeline.BallPipeline(scale=scale, lut=lut)
+
+    def run(frame):
+        _, distance, angle, offset = ball_pipeline.measure(frame)
+        return None if distance is None else (distance, angle, offset)
+
+    run.workspaces = workspaces(ball_pipeline)
+    return run
+
+
+def tape_roi_runner(**options):
+    return tape_runner(track_roi=True, **options)
+
+
+RUNNERS = {"tape": tape_runner, "tape-roi": tape_roi_runner, "ball": ball_runner}
+"""Functions building a callable that runs one pipeline on a frame and returns
+its distance, angle and offset, or None if it found nothing, with the
+pipeline's ``workspaces`` attached. ``tape`` searches
+every frame in full, ``tape-roi`` tracks the pair like the robot does with
+``--roi``, which only pays off on sequential frames such as a video or a
+recording."""
+
+TRUTH_RUNNERS = ("tape", "tape-roi")
+"""Pipelines whose output can be compared to the synthetic ground truth"""
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles of a list of durations in seconds, in milliseconds."""
+    if not latencies:
+        return {}
+    latencies = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+    return {
+        "mean": float(latencies.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(latencies.max()),
+    }
+
+
+def allocation_stats(allocations: List[int]) -> Dict[str, float]:
+    """Stats of the bytes allocated while processing each frame, in kilobytes."""
+    if not allocations:
+        return {}
+    allocations = np.array(allocations) / 1024
+    return {
+        "mean": float(allocations.mean()),
+        "p50": float(np.percentile(allocations, 50)),
+        "max": float(allocations.max()),
+    }
+
+
+def error_stats(errors: List[float]) -> Dict[str, float]:
+    if not errors:
+        return {}
+    errors = np.abs(errors)
+    p50, p95 = np.percentile(errors, (50, 95))
+    return {
+        "mean": float(errors.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "max": float(errors.max()),
+    }
+
+
+def pose_errors(measurement: tuple, targets: list) -> tuple:
+    """Errors against the target whose lateral offset is closest to the one seen."""
+    distance, angle, offset = measurement
+    truth = min(targets, key=lambda target: abs(target.offset - offset))
+    return (distance - truth.distance, angle - truth.angle, offset - truth.offset)
+
+
+def run_benchmark(
+    frames: Iterator[tuple], runners: Dict[str, callable], warmup: int = 0
+) -> Dict[str, dict]:
+    """Run every frame through every runner and collect per-frame latencies.
+
+    ``frames`` yields ``(image, targets)`` pairs, where ``targets`` is the
+    synthetic ground truth or None for recorded frames. The bytes each runner's
+    workspaces grow by are recorded for every frame, which is 0 once a pipeline
+    only reuses its buffers. If tracemalloc is tracing, so is the highest traced
+    memory over all its frames and, on Python 3.9 and later, the peak memory it
+    allocates on top of what was already allocated in every frame.
+    """
+    trace = tracemalloc.is_tracing()
+    # reset_peak is new in Python 3.9
+    per_frame = trace and hasattr(tracemalloc, "reset_peak")
+    allocations = {name: [] for name in runners}
+    growth = {name: [] for name in runners}
+    # the traced peak is reset for every frame, so keep the highest one here
+    peaks = {name: 0 for name in runners}
+    latencies = {name: [] for name in runners}
+    detections = {name: 0 for name in runners}
+    errors = {name: ([], [], []) for name in runners}
+    with_truth = 0
+
+    for index, (frame, targets) in enumerate(frames):
+        measured = index >= warmup
+        with_truth += measured and targets is not None
+        for name, run in runners.items():
+            buffers = getattr(run, "workspaces", ())
+            buffered = sum(workspace.nbytes for workspace in buffers)
+            if per_frame:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            measurement = run(frame)
+            elapsed = time.perf_counter() - start
+            if not measured:
+                continue
+            latencies[name].append(elapsed)
+            growth[name].append(
+                sum(workspace.nbytes for workspace in buffers) - buffered
+            )
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                peaks[name] = max(peaks[name], peak)
+            if per_frame:
+                allocations[name].append(peak - before)
+            if measurement is None:
+                continue
+            detections[name] += 1
+            if targets and name in TRUTH_RUNNERS:
+                for values, error in zip(
+                    errors[name], pose_errors(measurement, targets)
+                ):
+                    values.append(error)
+
+    results = {}
+    for name, values in latencies.items():
+        total = sum(values)
+        results[name] = {
+            "frames": len(values),
+            "fps": len(values) / total if total > 0 else None,
+            "detections": detections[name],
+            "latency_ms": latency_stats(values),
+            "workspace_kb_per_frame": allocation_stats(growth[name]),
+        }
+        if trace:
+            results[name]["allocated_kb_per_frame"] = (
+                allocation_stats(allocations[name])
+                if per_frame
+                else "unavailable before Python 3.9"
+            )
+            results[name]["peak_traced_mb"] = peaks[name] / 2 ** 20
+        if with_truth and name in TRUTH_RUNNERS:
+            distance, angle, offset = errors[name]
+            results[name]["pose_error"] = {
+                "distance_ft": error_stats(distance),
+                "angle_deg": error_stats(angle),
+                "offset_ft": error_stats(offset),
+            }
+    return results
+
+
+def describe_environment() -> Dict[str, str]:
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        )
+        commit = commit.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def main(argv: List[str] = None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        "source", nargs="?", help="video file, directory of images or recording"
+    )
+    ap.add_argument(
+        "-s",
+        "--synthetic",
+        type=int,
+        default=None,
+        metavar="N",
+        help="benchmark N synthetic frames with known pose instead of a source",
+    )
+    ap.add_argument("--seed", type=int, default=0, help="seed of the synthetic frames")
+    ap.add_argument(
+        "-p",
+        "--pipeline",
+        choices=sorted(RUNNERS) + ["all"],
+        default="all",
+        help="pipeline to benchmark",
+    )
+    ap.add_argument(
+        "--scale",
+        type=int,
+        choices=(1, 2, 4),
+        default=1,
+        help="search for targets at 1/N resolution (pyramid mode)",
+    )
+    ap.add_argument(
+        "--threshold",
+        choices=("hsv", "lut"),
+        default="hsv",
+        help="threshold with cvtColor + inRange or a cached BGR lookup table",
+    )
+    ap.add_argument(
+        "--corners",
+        choices=pipeline.CORNER_METHODS,
+        default="extreme",
+        help="how the tape pipelines pick the corners of each tape",
+    )
+    ap.add_argument(
+        "--pose",
+        choices=pipeline.POSE_MODES,
+        default="target",
+        help="solve each tape on its own or the whole target at once",
+    )
+    ap.add_argument(
+        "--pose-solver",
+        choices=pipeline.POSE_SOLVERS,
+        default="ippe",
+        help="solver for --pose target",
+    )
+    ap.add_argument(
+        "--max-reprojection-error",
+        type=float,
+        default=None,
+        metavar="PX",
+        help="drop poses reprojecting further than PX from the corners",
+    )
+    ap.add_argument(
+        "-r", "--repeat", type=int, default=1, help="number of passes over the source"
+    )
+    ap.add_argument(
+        "--warmup", type=int, default=5, help="frames to run before measuring"
+    )
+    ap.add_argument(
+        "--stages", action="store_true", help="also report per-stage timings"
+    )
+    ap.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="track peak and per-frame Python/NumPy allocations with tracemalloc "
+        "(slower, per frame needs Python 3.9)",
+    )
+    ap.add_argument(
+        "-o", "--output", type=str, default=None, help="write the JSON here"
+    )
+    args = ap.parse_args(argv)
+    if (args.source is None) == (args.synthetic is None):
+        ap.error("give either a source or --synthetic")
+
+    names = sorted(RUNNERS) if args.pipeline == "all" else [args.pipeline]
+    options = {"scale": args.scale, "lut": args.threshold == "lut"}
+    tape_options = dict(
+        options,
+        corner_method=args.corners,
+        pose_mode=args.pose,
+        pose_solver=args.pose_solver,
+        max_reprojection_error=args.max_reprojection_error,
+    )
+    runners = {
+        name: RUNNERS[name](**(tape_options if name.startswith("tape") else options))
+        for name in names
+    }
+
+    TIMINGS.reset()
+    TIMINGS.enabled = args.stages
+    if args.trace_memory:
+        tracemalloc.start()
+
+    def frames():
+        for _ in range(args.repeat):
+            if args.synthetic is not None:
+                yield from synthetic_frames(args.synthetic, seed=args.seed)
+            else:
+                for frame in read_frames(args.source):
+                    yield frame, None
+
+    results = run_benchmark(frames(), runners, warmup=args.warmup)
+
+    report = {
+        "source": args.source or "synthetic",
+        "scale": args.scale,
+        "threshold": args.threshold,
+        "corners": args.corners,
+        "pose": args.pose,
+        "pose_solver": args.pose_solver,
+        "max_reprojection_error": args.max_reprojection_error,
+        "pipelines": results,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "environment": describe_environment(),
+    }
+    if args.trace_memory:
+        report["peak_traced_mb"] = max(
+            [tracemalloc.get_traced_memory()[1] / 2 ** 20]
+            + [result.get("peak_traced_mb", 0) for result in results.values()]
+        )
+        tracemalloc.stop()
+    if args.stages:
+        report["stages_ms"] = TIMINGS.summary()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if not any(result["frames"] for result in results.values()):
+        sys.exit("No frames could be read from {}".format(report["source"]))
+
+
+if __name__ == "__main__":
+    main()
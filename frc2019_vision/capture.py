@@ -0,0 +1,158 @@
+import collections
+import logging
+import threading
+import time
+
+from . import StoppableThread
+from .shared_frames import FrameRing
+from .sources import CameraSource, FrameSource
+
+
+Frame = collections.namedtuple("Frame", ["image", "sequence", "timestamp", "slot"])
+"""A captured image, its capture sequence number, its ``time.monotonic()``
+capture time and the shared-memory slot holding it"""
+
+SLOT_BYTES = 1280 * 720 * 3
+"""Largest frame the capture thread can store, in bytes"""
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureThread(StoppableThread):
+    """Continuously drains a frame source and exposes only the newest frame.
+
+    Reading on a dedicated thread keeps the V4L2 buffer empty, so consumers always
+    get the most recent image instead of whatever has been queued up while they
+    were busy. Frames that are replaced before any consumer picked them up are
+    counted in ``dropped``.
+
+    Frames are decoded straight into a shared-memory ``FrameRing``, so the
+    vision thread, the worker processes and the driverstation stream all read the
+    same copy. Frames returned by ``latest`` and ``wait_for_frame`` are pinned in
+    the ring and must be handed back with ``release`` once the caller is done.
+    """
+
+    def __init__(self, source: FrameSource = None, num_slots: int = 4):
+        StoppableThread.__init__(self)
+        self._requested_source = source if source is not None else CameraSource()
+        self._source: FrameSource = None
+        self._condition = threading.Condition()
+        self._latest: Frame = None
+        self._consumed = True
+        self._shape = None
+        self.frames = FrameRing(num_slots, SLOT_BYTES)
+        self.sequence = 0
+        self.dropped = 0
+
+    def open(self, source: FrameSource):
+        """Ask the capture thread to switch to a different source."""
+        with self._condition:
+            self._requested_source = source
+
+    def latest(self) -> Frame:
+        """Return the newest frame without waiting, or None if there is none."""
+        with self._condition:
+            return self._take(self._latest)
+
+    def wait_for_frame(self, after_sequence: int = 0, timeout: float = None) -> Frame:
+        """Block until a frame newer than ``after_sequence`` is available.
+
+        Returns None if ``timeout`` seconds pass or the thread is stopped first.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.stopped() or self._has_newer(after_sequence), timeout
+            )
+            if not self._has_newer(after_sequence):
+                return None
+            return self._take(self._latest)
+
+    def release(self, frame: Frame):
+        """Let the capture thread reuse the slot of a frame."""
+        self.frames.release(frame.slot)
+
+    def run(self):
+        try:
+            while not self.stopped():
+                if self._requested_source is not None:
+                    self._reopen()
+
+                # grab() returns as soon as the driver hands over a buffer, which
+                # is the closest we get to the real capture time
+                if not self._source.grab():
+                    time.sleep(0.01)
+                    continue
+                timestamp = time.monotonic()
+                sequence = self.sequence + 1
+
+                slot = self._retrieve(sequence, timestamp)
+                if slot is None:
+                    continue
+
+                with self._condition:
+                    if not self._consumed:
+                        self.dropped += 1
+                    self.sequence = sequence
+                    self._latest = Frame(
+                        self.frames.view(slot), sequence, timestamp, slot
+                    )
+                    self._consumed = False
+                    self._condition.notify_all()
+        finally:
+            if self._source is not None:
+                self._source.release()
+
+    def stop(self):
+        super().stop()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _retrieve(self, sequence: int, timestamp: float) -> int:
+        """Decode the grabbed frame into a free slot and return the slot."""
+        if self._shape is None:
+            ret, image = self._source.retrieve()
+        else:
+            slot, view = self.frames.begin_write(self._shape)
+            if slot is None:
+                # every slot is pinned by a reader, skip this frame
+                return None
+            ret, image = self._source.retrieve(image=view)
+            if ret and image is view:
+                self.frames.commit_write(slot, sequence, timestamp)
+                return slot
+            self.frames.abort_write(slot)
+
+        if not ret:
+            return None
+        if image.nbytes > self.frames.slot_bytes:
+            # keep going, the source may be switched to a smaller resolution
+            logger.error(
+                "Dropped a %dx%d frame, slots hold at most %d bytes",
+                image.shape[1],
+                image.shape[0],
+                self.frames.slot_bytes,
+            )
+            self._shape = None
+            return None
+        # First frame, or the resolution changed. Copy it in once and decode
+        # directly into the ring from now on.
+        self._shape = image.shape
+        return self.frames.write(image, sequence, timestamp)
+
+    def _take(self, frame: Frame) -> Frame:
+        if frame is None or not self.frames.pin(frame.slot, frame.sequence):
+            return None
+        self._consumed = True
+        return frame
+
+    def _has_newer(self, sequence: int) -> bool:
+        return self._latest is not None and self._latest.sequence > sequence
+
+    def _reopen(self):
+        with self._condition:
+            source, self._requested_source = self._requested_source, None
+        if self._source is not None:
+            self._source.release()
+        self._shape = None
+        self._source = source
+        self._source.open()
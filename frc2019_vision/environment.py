@@ -1,6 +1,11 @@
-from cv2 import VideoCapture
+from typing import Tuple
 
-from . import FrameQueue, OverwritingLifoQueue, Target
+from . import OverwritingLifoQueue, Target
+from .capture import CaptureThread
+from .recording import RecordingThread
+from .vision.constants import CALIBRATION_FILE_LOCATION
+from .vision.results import ResultStore
+from .vision.tracker import PoseTracker
 
 
 TARGET: OverwritingLifoQueue = OverwritingLifoQueue(2)
@@ -9,14 +14,47 @@ TARGET.put(Target.NONE)
 
 GUI: bool = False
 CAMERA_PORT: int = 0
-VIDEO_STREAM: VideoCapture = VideoCapture(CAMERA_PORT)
+# Frame source spec replacing the camera (see sources.from_spec), replayed at the
+# recorded rate if REALTIME and restarted at the end if LOOP
+SOURCE: str = None
+REALTIME: bool = True
+LOOP: bool = False
+# Single source of camera frames, created by threads.create()
+CAPTURE: CaptureThread = None
 
 NETIFACE: str = "eth0"
 
-# Que for vision to driverstation
-DRIVERSTATION_FRAMES: FrameQueue = FrameQueue(2)
+# Number of vision worker processes, 0 runs the pipelines on the vision thread
+VISION_WORKERS: int = 0
+# Pipelines search for targets at 1/PYRAMID_SCALE resolution
+PYRAMID_SCALE: int = 1
+# Threshold with a BGR lookup table instead of cvtColor + inRange
+LUT: bool = False
+# Only search a region around the last tape pair, back to the whole frame after
+# ROI_MISSES frames in a row without it
+ROI: bool = False
+ROI_MISSES: int = 3
+# How the tape pipeline picks tape corners, one of pipeline.CORNER_METHODS. Can
+# be changed while running
+CORNER_METHOD: str = "extreme"
+# Calibration file the pipelines use and how many times it was set while running,
+# so setting the same file again reloads it
+CALIBRATION: Tuple[str, int] = (CALIBRATION_FILE_LOCATION, 0)
+# How the tape pipeline solves the target pose, see pipeline.POSE_MODES and
+# pipeline.POSE_SOLVERS, and the reprojection error (px) past which it is dropped
+POSE_MODE: str = "target"
+POSE_SOLVER: str = "ippe"
+MAX_REPROJECTION_ERROR: float = None
+
+# Recording of every processed frame, created by threads.create() if requested
+RECORD_FILE: str = None
+RECORDER: RecordingThread = None
+
+# File the pipeline stage timings are written to on shutdown, if any
+TIMINGS_FILE: str = None
 
 # Vision Information
-DISTANCE_FROM_OBJECT: OverwritingLifoQueue = OverwritingLifoQueue(2)
-ANGLE_FROM_CENTER: OverwritingLifoQueue = OverwritingLifoQueue(2)
-LATERAL_OFFSET: OverwritingLifoQueue = OverwritingLifoQueue(2)
+# Result of the last processed frame, with every target in view
+RESULTS: ResultStore = ResultStore()
+# Filtered pose of the tracked target, predicted to the moment it is read
+TRACKER: PoseTracker = PoseTracker()
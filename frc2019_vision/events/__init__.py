@@ -1,5 +1,45 @@
+import threading
+
+
+_session = threading.local()
+_request = threading.local()
+
+
+def bind_session(session):
+    """Make ``session`` the connection events run on this thread belong to."""
+    _session.current = session
+
+
+def current_session():
+    """Return the connection of the event being run, None outside of one."""
+    return getattr(_session, "current", None)
+
+
+class RequestContext:
+    """Makes the events run in the block read the vision results only once, so
+    every keyword of a request reports the same frame."""
+
+    def __enter__(self):
+        self._outer = getattr(_request, "reads", None)
+        if self._outer is None:
+            _request.reads = {}
+
+    def __exit__(self, *exc_info):
+        if self._outer is None:
+            _request.reads = None
+
+
+def read_once(read):
+    """Return ``read()``, called only once per ``RequestContext``."""
+    reads = getattr(_request, "reads", None)
+    if reads is None:
+        return read()
+    if read not in reads:
+        reads[read] = read()
+    return reads[read]
+
+
 def assemble_message(message: str, error: bool = False) -> str:
-    print("Assembling Message")
     if error:
         message = "-ERR {0}".format(message)
     else:
@@ -1,4 +1,7 @@
+import struct
+
 from abc import ABCMeta, abstractmethod
+from typing import List
 
 
 class BaseEvent(metaclass=ABCMeta):
@@ -9,10 +12,19 @@ class BaseEvent(metaclass=ABCMeta):
 
 
 class BaseGetEvent(BaseEvent):
+    # Layout of each row of ``values`` in the binary protocol, None if the reply
+    # is only text
+    ROW: struct.Struct = None
+
     @staticmethod
     def event_id() -> str:
         return "get"
 
+    @staticmethod
+    def values() -> List[tuple]:
+        """Rows of numbers ``run`` formats, None where missing."""
+        return []
+
     @staticmethod
     @abstractmethod
     def run() -> str:
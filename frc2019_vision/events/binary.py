@@ -0,0 +1,109 @@
+"""Binary protocol for the RIO connection, chosen with ``SET protocol binary``.
+
+Requests and replies are frames of a fixed header in network byte order
+followed by ``length`` bytes of payload::
+
+    opcode     u8   GET or SET, echoed in the reply
+    status     u8   0 in requests, OK or ERR in replies
+    request id u16  chosen by the RIO, echoed in the reply
+    length     u32  payload bytes
+
+A request's payload is the rest of the text command in ASCII, ``position`` or
+``target tape``. A GET with numbers to report replies with the rows of its
+``values`` packed as the event's ``ROW`` (float32, NaN where missing), so the
+size of the reply is known up front. A GET of several such keywords replies
+with the rows of each in order, each preceded by their count as a u16. Any
+other reply carries the text of the message without its ``+OK``/``-ERR``.
+
+Events are looked up in the same ``GET_EVENTS``/``SET_EVENTS`` registry as the
+text protocol. Opcodes never start with 0xFF, so streamed records can still be
+told apart.
+"""
+
+import math
+import struct
+
+from typing import Optional, Tuple
+
+from . import RequestContext, assemble_message
+from .handler import GET_EVENTS, SEPARATOR, parse
+
+
+HEADER = struct.Struct(">BBHI")
+COUNT = struct.Struct(">H")
+
+GET = 1
+SET = 2
+
+OK = 0
+ERR = 1
+
+COMMANDS = {GET: "GET", SET: "SET"}
+
+
+def split_frame(buffer: bytes, start: int = 0) -> Optional[Tuple[int, int, bytes, int]]:
+    """Return the opcode, request id and payload of the frame at ``start`` and
+    where the next one starts, or None if it hasn't fully arrived."""
+    if len(buffer) - start < HEADER.size:
+        return None
+    opcode, _, request_id, length = HEADER.unpack_from(buffer, start)
+    end = start + HEADER.size + length
+    if len(buffer) < end:
+        return None
+    return opcode, request_id, buffer[start + HEADER.size : end], end
+
+
+def frame_length(buffer: bytes, start: int = 0) -> Optional[int]:
+    """Payload length of the frame at ``start``, None if its header is cut."""
+    if len(buffer) - start < HEADER.size:
+        return None
+    return HEADER.unpack_from(buffer, start)[3]
+
+
+def encode(opcode: int, status: int, request_id: int, payload: bytes) -> bytes:
+    return HEADER.pack(opcode, status, request_id, len(payload)) + payload
+
+
+def _float(value) -> float:
+    return math.nan if value is None else value
+
+
+def _rows(event) -> Tuple[int, bytes]:
+    rows = event.values()
+    return len(rows), b"".join(event.ROW.pack(*map(_float, row)) for row in rows)
+
+
+def _text(opcode: int, request_id: int, reply: str) -> bytes:
+    status = ERR if reply.startswith("-ERR") else OK
+    return encode(opcode, status, request_id, reply[4:].lstrip().encode("utf-8"))
+
+
+def execute(opcode: int, request_id: int, payload: bytes) -> bytes:
+    """Run the command of a request frame and return the reply frame."""
+    command = COMMANDS.get(opcode)
+    if command is None:
+        return _text(
+            opcode,
+            request_id,
+            assemble_message("Invalid opcode: {}".format(opcode), True),
+        )
+
+    data = payload.decode("utf-8", "replace").split()
+    if command == "GET" and data:
+        events = [GET_EVENTS.get(keyword) for keyword in data]
+        if all(event is not None and event.ROW is not None for event in events):
+            if len(events) == 1:
+                return encode(opcode, OK, request_id, _rows(events[0])[1])
+            with RequestContext():
+                parts = [_rows(event) for event in events]
+            return encode(
+                opcode,
+                OK,
+                request_id,
+                b"".join(COUNT.pack(count) + rows for count, rows in parts),
+            )
+    reply = parse([command] + data)
+    if SEPARATOR in reply:
+        # several keywords, each reply keeps its +OK or -ERR
+        return encode(opcode, OK, request_id, reply.encode("utf-8"))
+    return _text(opcode, request_id, reply)
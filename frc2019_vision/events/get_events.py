@@ -1,5 +1,8 @@
-from . import assemble_message
+import struct
+
+from . import assemble_message, read_once
 from .. import environment
+from ..vision.timing import TIMINGS
 from .base_events import BaseGetEvent
 
 
@@ -13,16 +16,102 @@ class GetPing(BaseGetEvent):
         return assemble_message("pong")
 
 
+def _pose_string(distance, angle, offset, age) -> str:
+    if age is None:
+        return "None,None,None,None"
+    return "{0},{1},{2},{3:.3f}".format(distance, angle, offset, age)
+
+
 class GetPosition(BaseGetEvent):
+    ROW = struct.Struct(">ffff")
+
     @staticmethod
     def event_id() -> str:
         return "position"
 
+    @staticmethod
+    def values():
+        # predicted to now, so it stays smooth between frames and through a few
+        # missed detections, with the age in seconds of the last detection.
+        # Predicted from the state published with the latest result, so it
+        # agrees with measured and targets of the same request
+        snapshot = read_once(environment.RESULTS.latest)
+        if snapshot is None or snapshot.track is None:
+            return [(None, None, None, None)]
+        pose = environment.TRACKER.predict(state=snapshot.track)
+        if pose is None:
+            return [(None, None, None, None)]
+        return [pose]
+
+    @staticmethod
+    def run() -> str:
+        return assemble_message(_pose_string(*GetPosition.values()[0]))
+
+
+class GetMeasured(BaseGetEvent):
+    ROW = struct.Struct(">ffff")
+
+    @staticmethod
+    def event_id() -> str:
+        return "measured"
+
+    @staticmethod
+    def values():
+        # the unfiltered result of the last processed frame and its age in
+        # seconds, all None before the first one
+        snapshot = read_once(environment.RESULTS.latest)
+        if snapshot is None:
+            return [(None, None, None, None)]
+        return [
+            (
+                snapshot.distance,
+                snapshot.angle,
+                snapshot.offset,
+                environment.RESULTS.age(snapshot),
+            )
+        ]
+
+    @staticmethod
+    def run() -> str:
+        return assemble_message(_pose_string(*GetMeasured.values()[0]))
+
+
+class GetTargets(BaseGetEvent):
+    ROW = struct.Struct(">fffff")
+
+    @staticmethod
+    def event_id() -> str:
+        return "targets"
+
+    @staticmethod
+    def values():
+        # distance,angle,offset,score,bearing of every visible target, best score
+        # first
+        snapshot = read_once(environment.RESULTS.latest)
+        return list(snapshot.targets) if snapshot is not None else []
+
+    @staticmethod
+    def run() -> str:
+        # one target per semicolon
+        string = ";".join(
+            "{0},{1},{2},{3:.3f},{4:.3f}".format(*target)
+            for target in GetTargets.values()
+        )
+        return assemble_message(string)
+
+
+class GetTimings(BaseGetEvent):
+    @staticmethod
+    def event_id() -> str:
+        return "timings"
+
     @staticmethod
     def run() -> str:
-        string = "{0},{1},{2}".format(
-            environment.DISTANCE_FROM_OBJECT.get(),
-            environment.ANGLE_FROM_CENTER.get(),
-            environment.LATERAL_OFFSET.get(),
+        # stage=p50/p95/p99/max in milliseconds, one stage per comma
+        string = ",".join(
+            "{0}={1[p50]:.3f}/{1[p95]:.3f}/{1[p99]:.3f}/{1[max]:.3f}".format(
+                name, stats
+            )
+            for name, stats in sorted(TIMINGS.summary().items())
         )
         return assemble_message(string)
@@ -1,10 +1,17 @@
-from . import assemble_message, get_events, set_events  # noqa: F401
+from . import RequestContext, assemble_message, get_events, set_events  # noqa: F401
 from .base_events import BaseGetEvent, BaseSetEvent
 
 
 GET_EVENTS: dict = {}
 SET_EVENTS: dict = {}
 
+# keyword -> run of its event, one lookup per keyword of a request
+GET_DISPATCH: dict = {}
+SET_DISPATCH: dict = {}
+
+# Replies to a request of several keywords are joined into one line by this
+SEPARATOR = "\t"
+
 
 def index():
     base_events: tuple = [BaseGetEvent, BaseSetEvent]
@@ -15,27 +22,46 @@ def index():
                 GET_EVENTS[event.event_id()] = event
             elif base_event_id == "set":
                 SET_EVENTS[event.event_id()] = event
+    GET_DISPATCH.update((key, event.run) for key, event in GET_EVENTS.items())
+    SET_DISPATCH.update((key, event.run) for key, event in SET_EVENTS.items())
+
+
+def _get(keyword: str) -> str:
+    run = GET_DISPATCH.get(keyword)
+    if run is None:
+        return assemble_message("Invalid keyword for GET", True)
+    return run()
+
+
+def _set(keyword: str, arg: str) -> str:
+    run = SET_DISPATCH.get(keyword)
+    if run is None:
+        return assemble_message("Invalid keyword for SET", True)
+    return run(arg)
 
 
 def parse(data: list) -> str:
+    """Run ``GET key...`` or ``SET key arg [key arg]...``.
+
+    Every keyword of a GET reports the same vision result, SETs run in order.
+    With more than one keyword the replies are joined by ``SEPARATOR``, each
+    with its own ``+OK`` or ``-ERR``.
+    """
     command = data[0]
-    try:
-        keyword = data[1]
-    except IndexError:
+    if len(data) < 2:
         return assemble_message("No keyword supplied", True)
 
     if command == "GET":
-        if keyword in GET_EVENTS.keys():
-            return GET_EVENTS[keyword].run()
-        else:
-            return assemble_message("Invalid keyword for GET", True)
+        if len(data) == 2:
+            return _get(data[1])
+        with RequestContext():
+            replies = [_get(keyword) for keyword in data[1:]]
     elif command == "SET":
-        if keyword in SET_EVENTS.keys():
-            if len(data) > 2:
-                return SET_EVENTS[keyword].run(data[2])
-            else:
-                return assemble_message("Arg not supplied for SET", True)
-        else:
-            return assemble_message("Invalid keyword for SET", True)
+        if len(data) % 2 == 0:
+            return assemble_message("Arg not supplied for SET", True)
+        if len(data) == 3:
+            return _set(data[1], data[2])
+        replies = [_set(data[i], data[i + 1]) for i in range(1, len(data), 2)]
     else:
         return assemble_message("Invalid command: {}".format(command), True)
+    return SEPARATOR.join(replies)
@@ -1,7 +1,8 @@
-from imutils.video import VideoStream
-
-from . import assemble_message
-from .. import Target, args, environment
+from . import assemble_message, current_session
+from .. import Target, args, environment, sources
+from ..vision.calibration import load_calibration
+from ..vision.pipeline import CORNER_METHODS
+from ..vision.timing import TIMINGS
 from .base_events import BaseSetEvent
 
 
@@ -27,5 +28,109 @@ class SetCameraPort(BaseSetEvent):
 
     @staticmethod
     def run(arg: str) -> str:
-        environment.CAMERA_PORT = arg
-        environment.VIDEO_STREAM = VideoStream(src=environment.CAMERA_PORT).start()
+        try:
+            port = int(arg)
+        except ValueError:
+            return assemble_message("Invalid camera port", True)
+        environment.CAMERA_PORT = port
+        environment.CAPTURE.open(sources.CameraSource(port))
+        return assemble_message("Camera port set to: {}".format(port))
+
+
+class SetCorners(BaseSetEvent):
+    @staticmethod
+    def event_id() -> str:
+        return "corners"
+
+    @staticmethod
+    def run(arg: str) -> str:
+        arg = arg.lower()
+        if arg not in CORNER_METHODS:
+            return assemble_message("Invalid corner method", True)
+        environment.CORNER_METHOD = arg
+        return assemble_message("Corner method set to: {}".format(arg))
+
+
+class SetCalibration(BaseSetEvent):
+    @staticmethod
+    def event_id() -> str:
+        return "calibration"
+
+    @staticmethod
+    def run(arg: str) -> str:
+        # only .npz, a pickle sent over the network could run anything. Load it
+        # here so a bad file is reported instead of being skipped by the
+        # pipelines, and they find it cached
+        if not arg.endswith(".npz"):
+            return assemble_message("Calibration must be an .npz file", True)
+        try:
+            load_calibration(arg)
+        except (OSError, ValueError):
+            return assemble_message("Invalid calibration file", True)
+        environment.CALIBRATION = (arg, environment.CALIBRATION[1] + 1)
+        return assemble_message("Calibration set to: {}".format(arg))
+
+
+class SetTimings(BaseSetEvent):
+    @staticmethod
+    def event_id() -> str:
+        return "timings"
+
+    @staticmethod
+    def run(arg: str) -> str:
+        arg = arg.lower()
+        if arg == "on":
+            TIMINGS.enabled = True
+        elif arg == "off":
+            TIMINGS.enabled = False
+        elif arg == "reset":
+            TIMINGS.reset()
+        else:
+            return assemble_message("Invalid timings mode", True)
+        return assemble_message("Timings {}".format(arg))
+
+
+class SetStream(BaseSetEvent):
+    @staticmethod
+    def event_id() -> str:
+        return "stream"
+
+    @staticmethod
+    def run(arg: str) -> str:
+        # "on" pushes every result, a number at most that many per second and
+        # "off" stops, see streaming.py for the records
+        session = current_session()
+        if session is None:
+            return assemble_message("Streaming needs a connection", True)
+        arg = arg.lower()
+        if arg == "on":
+            rate = None
+        elif arg == "off":
+            rate = 0
+        else:
+            try:
+                rate = float(arg)
+            except ValueError:
+                return assemble_message("Invalid stream rate", True)
+            if not rate >= 0:
+                return assemble_message("Invalid stream rate", True)
+        session.stream(rate)
+        return assemble_message("Stream {}".format(arg))
+
+
+class SetProtocol(BaseSetEvent):
+    @staticmethod
+    def event_id() -> str:
+        return "protocol"
+
+    @staticmethod
+    def run(arg: str) -> str:
+        # the reply is still in the protocol of the request, see events.binary
+        session = current_session()
+        if session is None:
+            return assemble_message("Protocols need a connection", True)
+        arg = arg.lower()
+        if arg not in ("text", "binary"):
+            return assemble_message("Invalid protocol", True)
+        session.use_protocol(arg == "binary")
+        return assemble_message("Protocol {}".format(arg))
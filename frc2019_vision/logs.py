@@ -0,0 +1,57 @@
+"""Logging setup, with repeated messages rate limited.
+
+The RIO connection logs every command at ``DEBUG``, and a misbehaving client can
+trigger the same warning hundreds of times a second, so each message template
+passes at most ``burst`` times per ``interval`` seconds. The next record let
+through says how many were suppressed in between.
+"""
+
+import logging
+import threading
+import time
+
+
+LEVELS = ("debug", "info", "warning", "error")
+
+FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops records of a message template beyond ``burst`` per ``interval``."""
+
+    def __init__(self, burst: int = 10, interval: float = 1.0, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (logger, template) -> [window start, records in window, suppressed]
+        self._windows = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = self.clock()
+        key = (record.name, record.msg)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                window = self._windows[key] = [now, 0, suppressed]
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+
+        if suppressed:
+            record.msg = "{} ({} similar suppressed)".format(record.msg, suppressed)
+        return True
+
+
+def configure(level: str = "warning", burst: int = 10, interval: float = 1.0):
+    """Log to stderr at ``level`` (one of ``LEVELS``), rate limited."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(FORMAT))
+    handler.addFilter(RateLimitFilter(burst, interval))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
@@ -1,5 +1,7 @@
+import logging
 import pickle
 import socketserver
+import threading
 
 from enum import Enum
 
@@ -8,7 +10,15 @@ import cv2
 import netifaces
 
 from . import StoppableThread, environment
+from .events import assemble_message, binary, bind_session
 from .events import handler as event_handler
+from .streaming import PoseStreamThread
+
+
+logger = logging.getLogger(__name__)
+
+MAX_COMMAND_LENGTH = 4096
+"""Longest command line or binary payload accepted, in bytes"""
 
 
 class ConnectionType(Enum):
@@ -17,30 +27,139 @@ class ConnectionType(Enum):
 
 
 class RioConnectionHandler(socketserver.BaseRequestHandler):
+    """Serves the commands of one RIO connection.
+
+    Commands and replies are lines ending in ``\n``, or frames of the binary
+    protocol in ``events.binary`` after ``SET protocol binary``. Any number of
+    commands may arrive in one segment, or one command over several; every
+    complete command received is answered in order, with all the replies in one
+    send.
+
+    Events run during ``handle`` find the connection with
+    ``events.current_session``. ``SET stream`` makes it push vision results
+    from a ``PoseStreamThread``, sends from both threads are serialized.
+    """
+
+    def setup(self):
+        self._send_lock = threading.Lock()
+        self._stream: PoseStreamThread = None
+        self.binary = False
+
+    def send(self, data: bytes):
+        with self._send_lock:
+            self.request.sendall(data)
+
+    def stream(self, rate: float = None):
+        """Push every result (at most ``rate`` per second), stop if 0.
+
+        Streaming starts once the reply to the current command is sent, so the
+        reply always comes first.
+        """
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.join()
+            self._stream = None
+        if rate != 0:
+            self._stream = PoseStreamThread(self.send, environment.RESULTS, rate)
+
+    def use_protocol(self, binary_protocol: bool):
+        """Switch protocols, from the command after the current one on."""
+        self.binary = binary_protocol
+
+    def finish(self):
+        self.stream(0)
+        bind_session(None)
+
     def handle(self):
-        BUFFER_SIZE: int = 1024
+        bind_session(self)
+        BUFFER_SIZE: int = 4096
+        pending = b""
+        discarding = False
         while True:
-            # receive data
-            raw_data = self.request.recv(BUFFER_SIZE)
+            try:
+                raw_data = self.request.recv(BUFFER_SIZE)
+            except OSError:
+                break
 
             # if we receive an empty string assume the connection has closed
             # and break out of the while loop
-            if raw_data == bytes("", "utf-8"):
+            if not raw_data:
                 break
 
-            # decode data
-            decoded_data = raw_data.decode("utf-8")
+            # one command at a time, any of them can switch protocols
+            pending += raw_data
+            replies = []
+            start = 0
+            while True:
+                if self.binary:
+                    frame = binary.split_frame(pending, start)
+                    if frame is None:
+                        break
+                    opcode, request_id, payload, start = frame
+                    replies.append(self.execute_frame(opcode, request_id, payload))
+                    continue
+
+                end = pending.find(b"\n", start)
+                if end < 0:
+                    break
+                line, start = pending[start:end], end + 1
+                if discarding:
+                    # the end of a command that was too long
+                    discarding = False
+                elif line.strip():
+                    replies.append(self.execute(line).encode("utf-8") + b"\n")
+            # the rest is the start of a command still on its way
+            pending = pending[start:]
+
+            if self.binary:
+                length = binary.frame_length(pending)
+                if length is not None and length > MAX_COMMAND_LENGTH:
+                    # there is no way to find the next frame, give up
+                    logger.warning("Closed on a frame over %d bytes", length)
+                    break
+            elif len(pending) > MAX_COMMAND_LENGTH:
+                logger.warning("Dropped a command over %d bytes", MAX_COMMAND_LENGTH)
+                if not discarding:
+                    reply = assemble_message("Command too long", True)
+                    replies.append(reply.encode("utf-8") + b"\n")
+                pending, discarding = b"", True
+            if not replies:
+                continue
+
+            try:
+                self.send(b"".join(replies))
+            except OSError:
+                break
+            if self._stream is not None and self._stream.ident is None:
+                self._stream.start()
 
-            print("Received: " + decoded_data)
-            # parses get or set
-            reply: str = event_handler.parse(decoded_data.rstrip("\n").split(" "))
-            self.request.send(bytes(reply, "utf-8"))
-            print("Sent: " + reply)
+    def execute(self, line: bytes) -> str:
+        """Run one command line and return its reply."""
+        command = line.decode("utf-8", "replace").strip()
+        logger.debug("Received: %s", command)
+        try:
+            reply = event_handler.parse(command.split())
+        except Exception:
+            logger.exception("Command failed: %s", command)
+            reply = assemble_message("Command failed", True)
+        logger.debug("Sent: %s", reply)
+        return reply
+
+    def execute_frame(self, opcode: int, request_id: int, payload: bytes) -> bytes:
+        """Run one binary request and return its reply frame."""
+        logger.debug("Received frame %d: %d %r", request_id, opcode, payload)
+        try:
+            return binary.execute(opcode, request_id, payload)
+        except Exception:
+            logger.exception("Command failed: %d %r", opcode, payload)
+            return binary.encode(opcode, binary.ERR, request_id, b"Command failed")
 
 
 class RioConnectionFactoryThread(StoppableThread):
     def __init__(self):
         StoppableThread.__init__(self)
+        # a connected RIO keeps the server busy, don't let it hold up exiting
+        self.daemon = True
         # fmt: off
         self._ip = netifaces.ifaddresses(environment.NETIFACE)[netifaces.AF_INET][0]["addr"]  # noqa
         # fmt: on
@@ -56,7 +175,9 @@ class RioConnectionFactoryThread(StoppableThread):
             self.stop()
 
     def stop(self):
-        self._server.shutdown()
+        # shutdown() waits for the connection being served to end, which it
+        # may never do
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
 
 
 class DriverstationConnectionHandler(socketserver.BaseRequestHandler):
@@ -65,12 +186,19 @@ class DriverstationConnectionHandler(socketserver.BaseRequestHandler):
         socket: socket.socket = self.request[1]
 
         packets = 0
+        sequence = 0
         while True:
             # print("CONNECTED: " + str(initial.decode('utf-8')))
-            # somehow get feed
-            feed = environment.DRIVERSTATION_FRAMES.get()
+            # encode straight from the capture thread's shared frame
+            feed = environment.CAPTURE.wait_for_frame(sequence, timeout=0.5)
+            if feed is None:
+                continue
+            sequence = feed.sequence
             encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 40]
-            result, encimg = cv2.imencode(".jpg", feed, encode_param)
+            try:
+                result, encimg = cv2.imencode(".jpg", feed.image, encode_param)
+            finally:
+                environment.CAPTURE.release(feed)
             packet = pickle.dumps([encimg, packets])
             # socket.sendto(packet, self.client_address)
             socket.sendto(packet, self.client_address)
@@ -80,6 +208,7 @@ class DriverstationConnectionHandler(socketserver.BaseRequestHandler):
 class DriverstationConnectionFactoryThread(StoppableThread):
     def __init__(self):
         StoppableThread.__init__(self)
+        self.daemon = True
         # fmt: off
         self._HOST = netifaces.ifaddresses(environment.NETIFACE)[netifaces.AF_INET][0]["addr"] # noqa
         # fmt: on
@@ -95,4 +224,6 @@ class DriverstationConnectionFactoryThread(StoppableThread):
             self.stop()
 
     def stop(self):
-        self._server.shutdown()
+        # shutdown() waits for the connection being served to end, which it
+        # may never do
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
@@ -0,0 +1,321 @@
+"""Append-only recording of camera frames and vision results.
+
+A recording file is laid out as::
+
+    file header | chunk | chunk | ... | index | footer
+
+Every chunk starts with a chunk header followed by the records written in one
+go, and every record is a record header followed by the raw frame, aligned so it
+can be viewed in place. The index and footer are only written when the recording
+is closed; if the robot loses power before that, ``RecordingReader`` rebuilds the
+index by walking the chunks.
+"""
+
+import collections
+import math
+import mmap
+import queue
+
+from typing import List
+
+import numpy as np
+
+from . import StoppableThread, Target
+from .shared_frames import DTYPES, FrameRing
+
+
+MAGIC = b"FRCVREC1"
+CHUNK_MAGIC = b"FRCCHUNK"
+FOOTER_MAGIC = b"FRCINDEX"
+VERSION = 1
+
+ALIGNMENT = 64
+"""Frame data starts on a multiple of this many bytes"""
+
+FILE_HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("pad", "<u4")])
+
+CHUNK_HEADER_DTYPE = np.dtype(
+    [("magic", "S8"), ("records", "<u4"), ("pad", "<u4"), ("size", "<u8")]
+)
+
+RECORD_HEADER_DTYPE = np.dtype(
+    [
+        ("sequence", "<i8"),
+        ("timestamp", "<f8"),
+        ("distance", "<f8"),
+        ("angle", "<f8"),
+        ("offset", "<f8"),
+        ("height", "<u4"),
+        ("width", "<u4"),
+        ("channels", "<u4"),
+        ("dtype", "<u1"),
+        ("target", "<u1"),
+        ("pad", "<u2"),
+        ("size", "<u8"),
+    ]
+)
+"""Header of a record, missing pipeline outputs are stored as NaN"""
+
+INDEX_DTYPE = np.dtype([("sequence", "<i8"), ("timestamp", "<f8"), ("offset", "<u8")])
+"""One index entry per record, ``offset`` points at the record header"""
+
+FOOTER_DTYPE = np.dtype([("magic", "S8"), ("records", "<u8"), ("index", "<u8")])
+
+TARGETS: List[Target] = list(Target)
+"""Targets, indexed by the record header's ``target`` field"""
+
+
+def _padding(size: int) -> int:
+    return -size % ALIGNMENT
+
+
+def _float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _optional(value: float):
+    return None if math.isnan(value) else float(value)
+
+
+class RecordingWriter:
+    """Appends records to a recording file, one chunk per ``write_chunk`` call."""
+
+    def __init__(self, fname: str):
+        self._file = open(fname, "wb")
+        self._index = []
+        header = np.array([(MAGIC, VERSION, 0)], dtype=FILE_HEADER_DTYPE)
+        self._write(header.tobytes() + bytes(_padding(header.nbytes)))
+
+    def write_chunk(self, records: list):
+        """Write ``(image, sequence, timestamp, target, distance, angle, offset)``
+        records as one chunk and flush it to disk."""
+        parts = []
+        offset = self._file.tell() + CHUNK_HEADER_DTYPE.itemsize
+        offset += _padding(offset)
+        start = offset
+        for image, sequence, timestamp, target, distance, angle, offset_ft in records:
+            header = np.zeros(1, dtype=RECORD_HEADER_DTYPE)
+            header["sequence"] = sequence
+            header["timestamp"] = timestamp
+            header["distance"] = _float(distance)
+            header["angle"] = _float(angle)
+            header["offset"] = _float(offset_ft)
+            header["height"] = image.shape[0]
+            header["width"] = image.shape[1]
+            header["channels"] = image.shape[2] if image.ndim > 2 else 0
+            header["dtype"] = DTYPES.index(image.dtype)
+            header["target"] = TARGETS.index(target)
+            header["size"] = image.nbytes
+
+            self._index.append((sequence, timestamp, offset))
+            header_bytes = header.tobytes() + bytes(_padding(header.nbytes))
+            parts += [header_bytes, image, bytes(_padding(image.nbytes))]
+            offset += len(header_bytes) + image.nbytes + _padding(image.nbytes)
+
+        chunk = np.zeros(1, dtype=CHUNK_HEADER_DTYPE)
+        chunk["magic"] = CHUNK_MAGIC
+        chunk["records"] = len(records)
+        chunk["size"] = offset - start
+        chunk_bytes = chunk.tobytes()
+        self._write(chunk_bytes + bytes(_padding(self._file.tell() + len(chunk_bytes))))
+        for part in parts:
+            self._write(part)
+        self._file.flush()
+
+    def close(self):
+        index = np.array(self._index, dtype=INDEX_DTYPE)
+        index_offset = self._file.tell()
+        self._write(index.tobytes())
+        footer = np.array([(FOOTER_MAGIC, len(index), index_offset)], FOOTER_DTYPE)
+        self._write(footer.tobytes())
+        self._file.close()
+
+    def _write(self, data):
+        self._file.write(memoryview(data).cast("B"))
+
+
+RecordedFrame = collections.namedtuple(
+    "RecordedFrame",
+    ["image", "sequence", "timestamp", "target", "distance", "angle", "offset"],
+)
+
+
+class RecordingReader:
+    """Memory-maps a recording for zero-copy, random-access replay.
+
+    ``reader[i]`` returns the i-th record, whose image is a read-only view into the
+    mapped file, so seeking anywhere costs nothing and no frame is copied until
+    the caller does so.
+    """
+
+    def __init__(self, fname: str):
+        self._file = open(fname, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = np.frombuffer(self._map, dtype=np.uint8)
+
+        header = self._buffer[: FILE_HEADER_DTYPE.itemsize].view(FILE_HEADER_DTYPE)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError("{} is not a recording".format(fname))
+        if header["version"] != VERSION:
+            raise ValueError(
+                "unsupported recording version {}".format(header["version"])
+            )
+
+        self.index = self._read_index()
+        if self.index is None:
+            self.index = self._scan_index()
+        # worker processes finish frames out of order, replay in capture order
+        if np.any(np.diff(self.index["sequence"]) < 0):
+            self.index = np.sort(self.index, order="sequence")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> RecordedFrame:
+        offset = int(self.index[i]["offset"])
+        header = self._buffer[offset : offset + RECORD_HEADER_DTYPE.itemsize]
+        header = header.view(RECORD_HEADER_DTYPE)[0]
+
+        start = offset + RECORD_HEADER_DTYPE.itemsize
+        start += _padding(start)
+        shape = (int(header["height"]), int(header["width"]))
+        if header["channels"]:
+            shape += (int(header["channels"]),)
+        image = self._buffer[start : start + int(header["size"])]
+        image = image.view(DTYPES[header["dtype"]]).reshape(shape)
+
+        return RecordedFrame(
+            image,
+            int(header["sequence"]),
+            float(header["timestamp"]),
+            TARGETS[header["target"]],
+            _optional(header["distance"]),
+            _optional(header["angle"]),
+            _optional(header["offset"]),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find_sequence(self, sequence: int) -> int:
+        """Position of the first record with a sequence of at least ``sequence``."""
+        return int(np.searchsorted(self.index["sequence"], sequence))
+
+    def find_timestamp(self, timestamp: float) -> int:
+        """Position of the first record captured at or after ``timestamp``."""
+        return int(np.searchsorted(self.index["timestamp"], timestamp))
+
+    def close(self):
+        self.index = None
+        self._buffer = None
+        self._map.close()
+        self._file.close()
+
+    def _read_index(self) -> np.array:
+        if len(self._buffer) < FOOTER_DTYPE.itemsize:
+            return None
+        footer = self._buffer[-FOOTER_DTYPE.itemsize :].view(FOOTER_DTYPE)[0]
+        if footer["magic"] != FOOTER_MAGIC:
+            return None
+        start = int(footer["index"])
+        end = start + int(footer["records"]) * INDEX_DTYPE.itemsize
+        return self._buffer[start:end].view(INDEX_DTYPE)
+
+    def _scan_index(self) -> np.array:
+        """Rebuild the index of a recording that was never closed."""
+        entries = []
+        position = FILE_HEADER_DTYPE.itemsize + _padding(FILE_HEADER_DTYPE.itemsize)
+        while position + CHUNK_HEADER_DTYPE.itemsize <= len(self._buffer):
+            chunk = self._buffer[position : position + CHUNK_HEADER_DTYPE.itemsize]
+            chunk = chunk.view(CHUNK_HEADER_DTYPE)[0]
+            if chunk["magic"] != CHUNK_MAGIC:
+                break
+            offset = position + CHUNK_HEADER_DTYPE.itemsize
+            offset += _padding(offset)
+            end = offset + int(chunk["size"])
+            if end > len(self._buffer):
+                # the last chunk was cut short
+                break
+            for _ in range(int(chunk["records"])):
+                header = self._buffer[offset : offset + RECORD_HEADER_DTYPE.itemsize]
+                header = header.view(RECORD_HEADER_DTYPE)[0]
+                entries.append((header["sequence"], header["timestamp"], offset))
+                size = RECORD_HEADER_DTYPE.itemsize
+                offset += size + _padding(size)
+                offset += int(header["size"]) + _padding(int(header["size"]))
+            position = end
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+
+class RecordingThread(StoppableThread):
+    """Writes frames and vision results to a recording off the vision thread.
+
+    ``submit`` only pins the frame's shared-memory slot and queues it, it never
+    blocks and never copies. If the queue is full the frame is dropped and
+    counted in ``dropped``, so recording can never slow down the vision loop.
+    Up to ``max_pinned`` slots are pinned at once, the queued frames and the
+    chunk being written, and the ring needs that many slots on top of what
+    capture and vision use.
+    """
+
+    def __init__(self, fname: str, queue_size: int = 4, chunk_size: int = 4):
+        StoppableThread.__init__(self)
+        self.queue_size = queue_size
+        self._chunk_size = chunk_size
+        self.max_pinned = queue_size + chunk_size
+        self._queue = queue.Queue(queue_size)
+        self._writer = RecordingWriter(fname)
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, frames: FrameRing, slot: int, result) -> bool:
+        """Queue the frame in ``slot`` with the vision result computed from it."""
+        if self._queue.full() or not frames.pin(slot, result.sequence):
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((frames, slot, result))
+        except queue.Full:
+            frames.release(slot)
+            self.dropped += 1
+            return False
+        return True
+
+    def run(self):
+        try:
+            while not self.stopped() or not self._queue.empty():
+                try:
+                    items = [self._queue.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                # take whatever else is waiting, up to a chunk's worth
+                while len(items) < self._chunk_size:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write(items)
+        finally:
+            self._writer.close()
+
+    def _write(self, items: list):
+        try:
+            self._writer.write_chunk(
+                [
+                    (
+                        frames.view(slot),
+                        result.sequence,
+                        result.timestamp,
+                        result.target,
+                        result.distance,
+                        result.angle,
+                        result.offset,
+                    )
+                    for frames, slot, result in items
+                ]
+            )
+            self.written += len(items)
+        finally:
+            for frames, slot, _ in items:
+                frames.release(slot)
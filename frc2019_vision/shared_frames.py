@@ -0,0 +1,179 @@
+import ctypes
+import multiprocessing
+
+import numpy as np
+
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("sequence", np.int64),
+        ("timestamp", np.float64),
+        ("height", np.int32),
+        ("width", np.int32),
+        ("channels", np.int32),
+        ("dtype", np.int32),
+        ("readers", np.int32),
+    ]
+)
+"""Metadata stored in front of every frame slot"""
+
+DTYPES = [np.dtype(np.uint8), np.dtype(np.uint16), np.dtype(np.float32)]
+"""Pixel types a slot can hold, indexed by the header's ``dtype`` field"""
+
+EMPTY = 0
+"""Sequence number of a slot that does not hold a frame"""
+
+WRITING = -1
+"""Sequence number of a slot that is being written"""
+
+
+class FrameRing:
+    """Ring of frame slots in shared memory.
+
+    The capture side writes each frame into a slot once, and readers in this or
+    any worker process get zero-copy NumPy views of it. Readers pin the slot they
+    are looking at, and the writer never reuses a pinned slot or the newest one,
+    so a slow reader can never see a frame change underneath it. When every slot
+    is pinned the new frame is dropped and counted in ``overruns``.
+
+    Views handed to readers are read-only, only the writer's view from
+    ``begin_write`` can be written to.
+    """
+
+    def __init__(self, num_slots: int, slot_bytes: int):
+        context = multiprocessing.get_context("spawn")
+        self.num_slots = num_slots
+        self.slot_bytes = slot_bytes
+        self._lock = context.Lock()
+        self._raw_headers = context.RawArray(
+            ctypes.c_uint8, num_slots * HEADER_DTYPE.itemsize
+        )
+        self._raw_buffer = context.RawArray(ctypes.c_uint8, num_slots * slot_bytes)
+        self._raw_state = context.RawArray(ctypes.c_int64, 2)
+        self._attach()
+        self._state[0] = -1
+
+    def __getstate__(self):
+        # Only the shared memory and the lock travel to worker processes, the
+        # NumPy views are rebuilt on the other side
+        return (
+            self.num_slots,
+            self.slot_bytes,
+            self._lock,
+            self._raw_headers,
+            self._raw_buffer,
+            self._raw_state,
+        )
+
+    def __setstate__(self, state):
+        (
+            self.num_slots,
+            self.slot_bytes,
+            self._lock,
+            self._raw_headers,
+            self._raw_buffer,
+            self._raw_state,
+        ) = state
+        self._attach()
+
+    def _attach(self):
+        self._headers = np.frombuffer(self._raw_headers, dtype=HEADER_DTYPE)
+        self._buffer = np.frombuffer(self._raw_buffer, dtype=np.uint8)
+        # [0] is the newest slot, [1] counts frames dropped for lack of a slot
+        self._state = np.frombuffer(self._raw_state, dtype=np.int64)
+
+    @property
+    def overruns(self) -> int:
+        return int(self._state[1])
+
+    def begin_write(self, shape: tuple, dtype=np.uint8):
+        """Claim a free slot and return ``(slot, view)`` to write a frame into.
+
+        Returns ``(None, None)`` if every slot is pinned by a reader.
+        """
+        dtype = np.dtype(dtype)
+        if int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError(
+                "frame of shape {} does not fit in a {} byte slot".format(
+                    shape, self.slot_bytes
+                )
+            )
+
+        with self._lock:
+            slot = self._free_slot()
+            if slot is None:
+                self._state[1] += 1
+                return None, None
+            header = self._headers[slot]
+            header["sequence"] = WRITING
+            header["height"] = shape[0]
+            header["width"] = shape[1]
+            header["channels"] = shape[2] if len(shape) > 2 else 0
+            header["dtype"] = DTYPES.index(dtype)
+
+        return slot, self._view(slot)
+
+    def commit_write(self, slot: int, sequence: int, timestamp: float):
+        """Publish a slot filled through begin_write() as the newest frame."""
+        with self._lock:
+            self._headers[slot]["timestamp"] = timestamp
+            self._headers[slot]["sequence"] = sequence
+            self._state[0] = slot
+
+    def abort_write(self, slot: int):
+        with self._lock:
+            self._headers[slot]["sequence"] = EMPTY
+
+    def write(self, image: np.array, sequence: int, timestamp: float) -> int:
+        """Copy ``image`` into a free slot, returns the slot or None if dropped."""
+        slot, view = self.begin_write(image.shape, image.dtype)
+        if slot is None:
+            return None
+        view[...] = image
+        self.commit_write(slot, sequence, timestamp)
+        return slot
+
+    def pin(self, slot: int, sequence: int) -> bool:
+        """Keep ``slot`` from being reused, as long as it still holds ``sequence``."""
+        with self._lock:
+            header = self._headers[slot]
+            if header["sequence"] != sequence:
+                return False
+            header["readers"] += 1
+            return True
+
+    def release(self, slot: int):
+        with self._lock:
+            self._headers[slot]["readers"] -= 1
+
+    def view(self, slot: int) -> np.array:
+        """Zero-copy, read-only view of the frame in a pinned slot."""
+        view = self._view(slot)
+        view.flags.writeable = False
+        return view
+
+    def _view(self, slot: int) -> np.array:
+        header = self._headers[slot]
+        dtype = DTYPES[header["dtype"]]
+        shape = (int(header["height"]), int(header["width"]))
+        if header["channels"] > 0:
+            shape += (int(header["channels"]),)
+        start = slot * self.slot_bytes
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        return self._buffer[start : start + nbytes].view(dtype).reshape(shape)
+
+    def _free_slot(self) -> int:
+        # oldest unpinned slot that is not the newest frame
+        newest = self._state[0]
+        best = None
+        for slot in range(self.num_slots):
+            header = self._headers[slot]
+            if slot == newest or header["readers"] > 0:
+                continue
+            if header["sequence"] == WRITING:
+                continue
+            if header["sequence"] == EMPTY:
+                return slot
+            if best is None or header["sequence"] < self._headers[best]["sequence"]:
+                best = slot
+        return best
@@ -0,0 +1,240 @@
+"""Places the capture thread can read frames from.
+
+Every source has the ``grab``/``retrieve`` interface of ``cv2.VideoCapture``, so
+the capture thread can stamp the time a frame arrives before decoding it into
+shared memory. Sources other than the camera can either replay at the rate the
+frames were captured (``realtime``) or as fast as they can be read.
+"""
+
+import os
+import time
+
+from abc import ABCMeta, abstractmethod
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+from .recording import MAGIC, RecordingReader
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class FrameSource(metaclass=ABCMeta):
+    def __init__(self, realtime: bool = True, loop: bool = False):
+        self.realtime = realtime
+        self.loop = loop
+        self._started = None
+
+    def open(self):
+        """Called by the capture thread before the first grab()."""
+        self._started = None
+
+    @abstractmethod
+    def grab(self) -> bool:
+        """Advance to the next frame, returns False if there is none."""
+
+    @abstractmethod
+    def retrieve(self, image: np.array = None):
+        """Return ``(ret, image)`` for the grabbed frame, into ``image`` if the
+        frame fits it."""
+
+    def release(self):
+        pass
+
+    def frames(self) -> Iterator[np.array]:
+        """Yield every frame, for use outside of the capture thread."""
+        self.open()
+        try:
+            while self.grab():
+                ret, image = self.retrieve()
+                if ret:
+                    yield image
+        finally:
+            self.release()
+
+    def _pace(self, frame_time: float):
+        """Sleep until ``frame_time`` seconds after the first frame."""
+        if not self.realtime:
+            return
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now - frame_time
+        delay = self._started + frame_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _copy_into(frame: np.array, image: np.array):
+    if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+        image[...] = frame
+        return True, image
+    return True, frame.copy()
+
+
+class CameraSource(FrameSource):
+    def __init__(self, port: int = 0):
+        FrameSource.__init__(self, realtime=True)
+        self.port = port
+        self._device: cv2.VideoCapture = None
+
+    def open(self):
+        FrameSource.open(self)
+        self._device = cv2.VideoCapture(self.port)
+
+    def grab(self) -> bool:
+        return self._device.grab()
+
+    def retrieve(self, image: np.array = None):
+        return self._device.retrieve(image=image)
+
+    def release(self):
+        if self._device is not None:
+            self._device.release()
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False):
+        FrameSource.__init__(self, realtime, loop)
+        self.path = path
+        self._device: cv2.VideoCapture = None
+        self._index = 0
+        self._fps = 30.0
+
+    def open(self):
+        FrameSource.open(self)
+        self._device = cv2.VideoCapture(self.path)
+        self._fps = self._device.get(cv2.CAP_PROP_FPS) or 30.0
+        self._index = 0
+
+    def grab(self) -> bool:
+        if not self._device.grab():
+            if not self.loop:
+                return False
+            self._device.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            if not self._device.grab():
+                return False
+        self._pace(self._index / self._fps)
+        self._index += 1
+        return True
+
+    def retrieve(self, image: np.array = None):
+        return self._device.retrieve(image=image)
+
+    def release(self):
+        if self._device is not None:
+            self._device.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Plays the images of a directory in name order at ``fps``."""
+
+    def __init__(
+        self, path: str, fps: float = 30.0, realtime: bool = True, loop: bool = False
+    ):
+        FrameSource.__init__(self, realtime, loop)
+        self.path = path
+        self.fps = fps
+        self._names = []
+        self._index = 0
+        self._frame = None
+
+    def open(self):
+        FrameSource.open(self)
+        self._names = sorted(
+            name
+            for name in os.listdir(self.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._index = 0
+
+    def grab(self) -> bool:
+        while self._names:
+            if self._index >= len(self._names):
+                if not self.loop:
+                    return False
+                self._index = 0
+            self._frame = cv2.imread(os.path.join(self.path, self._names[self._index]))
+            self._pace(self._index / self.fps)
+            self._index += 1
+            if self._frame is not None:
+                return True
+        return False
+
+    def retrieve(self, image: np.array = None):
+        if self._frame is None:
+            return False, None
+        return _copy_into(self._frame, image)
+
+
+class RecordingSource(FrameSource):
+    """Replays a recording at the pace it was captured."""
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False):
+        FrameSource.__init__(self, realtime, loop)
+        self.path = path
+        self._reader: RecordingReader = None
+        self._index = 0
+        self._record = None
+
+    def open(self):
+        FrameSource.open(self)
+        if self._reader is None:
+            self._reader = RecordingReader(self.path)
+        self._index = 0
+
+    def grab(self) -> bool:
+        if self._index >= len(self._reader):
+            if not self.loop or len(self._reader) == 0:
+                return False
+            self._index = 0
+            self._started = None
+        self._record = self._reader[self._index]
+        self._pace(self._record.timestamp - self._reader[0].timestamp)
+        self._index += 1
+        return True
+
+    def retrieve(self, image: np.array = None):
+        # the only copy, straight from the mapped file into the caller's buffer
+        return _copy_into(self._record.image, image)
+
+    def release(self):
+        if self._reader is not None:
+            self._record = None
+            self._reader.close()
+            self._reader = None
+
+
+SOURCE_TYPES = ("camera", "video", "images", "recording")
+
+
+def from_path(path: str, realtime: bool = True, loop: bool = False) -> FrameSource:
+    """Pick the source type from what ``path`` points at."""
+    if os.path.isdir(path):
+        return ImageDirectorySource(path, realtime=realtime, loop=loop)
+    with open(path, "rb") as f:
+        is_recording = f.read(len(MAGIC)) == MAGIC
+    if is_recording:
+        return RecordingSource(path, realtime=realtime, loop=loop)
+    return VideoFileSource(path, realtime=realtime, loop=loop)
+
+
+def from_spec(spec: str, realtime: bool = True, loop: bool = False) -> FrameSource:
+    """Build a source from ``type:location``, e.g. ``camera:0`` or ``video:a.avi``.
+
+    A bare camera number or path works too.
+    """
+    kind, _, location = spec.partition(":")
+    if kind not in SOURCE_TYPES:
+        kind, location = None, spec
+
+    if kind == "camera" or (kind is None and location.isdigit()):
+        return CameraSource(int(location or 0))
+    if kind == "video":
+        return VideoFileSource(location, realtime=realtime, loop=loop)
+    if kind == "images":
+        return ImageDirectorySource(location, realtime=realtime, loop=loop)
+    if kind == "recording":
+        return RecordingSource(location, realtime=realtime, loop=loop)
+    return from_path(location, realtime=realtime, loop=loop)
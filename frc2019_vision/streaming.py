@@ -0,0 +1,88 @@
+"""Push-mode streaming of vision results to the RIO.
+
+After ``SET stream`` the RIO connection receives a fixed-size record for every
+new vision result, in network byte order so the RIO can read it with a
+``DataInputStream``::
+
+    marker  u8   always 0xFF, never the first byte of a text reply
+    version u8
+    flags   u8   bit 0 set if the target was detected
+    target  u8   index into recording.TARGETS
+    sequence u32 capture sequence number of the frame
+    age     f32  seconds from the capture of the frame to sending the record
+    distance, angle, offset  f32, NaN if missing
+"""
+
+import math
+import struct
+import time
+
+from . import StoppableThread
+from .recording import TARGETS
+from .vision.results import PoseSnapshot, ResultStore
+
+
+MARKER = 0xFF
+VERSION = 1
+DETECTED = 0x01
+
+RECORD = struct.Struct(">BBBBIffff")
+"""Layout of a streamed record, 24 bytes"""
+
+
+def _float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def pack_snapshot(snapshot: PoseSnapshot, age: float) -> bytes:
+    """Return the streamed record of ``snapshot``, sent ``age`` seconds after
+    its frame was captured."""
+    return RECORD.pack(
+        MARKER,
+        VERSION,
+        DETECTED if snapshot.detected else 0,
+        TARGETS.index(snapshot.target) if snapshot.target in TARGETS else 0,
+        snapshot.sequence & 0xFFFFFFFF,
+        age,
+        _float(snapshot.distance),
+        _float(snapshot.angle),
+        _float(snapshot.offset),
+    )
+
+
+class PoseStreamThread(StoppableThread):
+    """Sends every result published to ``results`` through ``send``.
+
+    With a ``rate`` (records per second) results arriving faster are skipped,
+    the first one published once the interval is up is sent as soon as it
+    arrives. The newest result is sent as soon as streaming starts. The thread
+    stops by itself once ``send`` raises ``OSError``, when the connection is
+    gone.
+    """
+
+    def __init__(self, send, results: ResultStore, rate: float = None):
+        StoppableThread.__init__(self)
+        self.daemon = True
+        self._send = send
+        self._results = results
+        self._interval = 0 if rate is None else 1 / rate
+        self.sent = 0
+
+    def run(self):
+        sequence = 0
+        next_send = 0
+        while not self.stopped():
+            snapshot = self._results.wait_for_result(sequence, timeout=0.5)
+            if snapshot is None:
+                continue
+            sequence = snapshot.sequence
+            now = time.monotonic()
+            if now < next_send:
+                continue
+
+            try:
+                self._send(pack_snapshot(snapshot, now - snapshot.timestamp))
+            except OSError:
+                break
+            next_send = now + self._interval
+            self.sent += 1
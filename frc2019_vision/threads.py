@@ -1,32 +1,79 @@
+import time
+
+from . import environment, sources
+from .capture import CaptureThread
 from .networking import (
     DriverstationConnectionFactoryThread,
     RioConnectionFactoryThread,
 )
+from .recording import RecordingThread
+from .vision.timing import TIMINGS
 from .vision.vision import VisionThread
 
 
+CAPTURE_THREAD = None
+RECORDING_THREAD = None
 VISION_THREAD = None
 RIO_THREAD = None
 DRIVERSTATION_THREAD = None
 
 
 def create():
+    global CAPTURE_THREAD
+    global RECORDING_THREAD
     global VISION_THREAD
     global RIO_THREAD
     global DRIVERSTATION_THREAD
 
+    # one slot per reader (vision thread or workers, driverstation, every frame
+    # the recorder holds), plus room for the newest frame and the one being
+    # written
+    num_slots = max(environment.VISION_WORKERS, 1) + 4
+    if environment.RECORD_FILE is not None:
+        RECORDING_THREAD = RecordingThread(environment.RECORD_FILE)
+        environment.RECORDER = RECORDING_THREAD
+        num_slots += RECORDING_THREAD.max_pinned
+
+    if environment.SOURCE is None:
+        source = sources.CameraSource(environment.CAMERA_PORT)
+    else:
+        source = sources.from_spec(
+            environment.SOURCE, realtime=environment.REALTIME, loop=environment.LOOP
+        )
+    CAPTURE_THREAD = CaptureThread(source, num_slots=num_slots)
+    environment.CAPTURE = CAPTURE_THREAD
     VISION_THREAD = VisionThread()
     RIO_THREAD = RioConnectionFactoryThread()
     DRIVERSTATION_THREAD = DriverstationConnectionFactoryThread()
 
 
 def start():
+    CAPTURE_THREAD.start()
+    if RECORDING_THREAD is not None:
+        RECORDING_THREAD.start()
     VISION_THREAD.start()
     RIO_THREAD.start()
     DRIVERSTATION_THREAD.start()
 
 
+def wait():
+    """Block until the vision thread ends, Ctrl-C still gets through."""
+    # not join(), a signal interrupting it can leave the thread looking stopped
+    while VISION_THREAD.is_alive():
+        time.sleep(0.5)
+
+
 def stop():
-    VISION_THREAD.stop()
-    RIO_THREAD.stop()
-    DRIVERSTATION_THREAD.stop()
+    # vision first so nothing is submitted to the recorder any more, and the
+    # recorder only once it can write its footer
+    for thread in (VISION_THREAD, CAPTURE_THREAD, RECORDING_THREAD):
+        if thread is not None and thread.is_alive():
+            thread.stop()
+            thread.join()
+
+    if environment.TIMINGS_FILE is not None:
+        TIMINGS.dump(environment.TIMINGS_FILE)
+
+    for thread in (RIO_THREAD, DRIVERSTATION_THREAD):
+        if thread is not None:
+            thread.stop()
@@ -0,0 +1,178 @@
+"""Camera calibration files.
+
+Calibrations are stored as ``.npz`` archives of plain arrays, with a small JSON
+header recording the format version, the resolution the camera was calibrated
+at and whether it has a fisheye lens. Unlike the pickles used before, they load
+without unpickling arbitrary objects and don't depend on the classes or NumPy
+version that wrote them. Old pickles still load, and can be converted with::
+
+    python -m frc2019_vision.vision.calibration old.pickle new.npz --resolution 640x480
+
+Loaded calibrations are cached for the whole process by path and modification
+time, so every pipeline shares one copy and a file is only read again once it
+changes.
+"""
+
+import argparse
+import collections
+import json
+import os
+import pickle
+import threading
+import zipfile
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+CalibrationResults = collections.namedtuple(
+    "CalibrationResults",
+    [
+        "camera_matrix",
+        "dist_coeffs",
+        "rvecs",
+        "tvecs",
+        "fisheye",
+        "resolution",
+    ],
+)
+"""Camera matrix and distortion of a camera, with the rvecs and tvecs of the
+calibration images. ``resolution`` is the ``(width, height)`` calibrated at, if
+known"""
+CalibrationResults.__new__.__defaults__ = (False, None)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def normalized(results: CalibrationResults) -> CalibrationResults:
+    """Return ``results`` with float64 arrays, however they were stored."""
+    return results._replace(
+        camera_matrix=np.asarray(results.camera_matrix, dtype=np.float64),
+        dist_coeffs=np.asarray(results.dist_coeffs, dtype=np.float64),
+        fisheye=bool(results.fisheye),
+    )
+
+
+def save_calibration(fname: str, results: CalibrationResults):
+    """Write ``results`` to ``fname`` in the ``.npz`` format.
+
+    The file is replaced atomically, so a running robot reloading it never
+    reads half of it.
+    """
+    header = {
+        "version": FORMAT_VERSION,
+        "fisheye": bool(results.fisheye),
+        "resolution": (
+            None if results.resolution is None else [int(n) for n in results.resolution]
+        ),
+    }
+    tmp = "{}.{}.tmp".format(fname, os.getpid())
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            header=np.array(json.dumps(header)),
+            camera_matrix=np.asarray(results.camera_matrix, dtype=np.float64),
+            dist_coeffs=np.asarray(results.dist_coeffs, dtype=np.float64),
+            rvecs=np.asarray(results.rvecs, dtype=np.float64).reshape(-1, 3),
+            tvecs=np.asarray(results.tvecs, dtype=np.float64).reshape(-1, 3),
+        )
+    os.replace(tmp, fname)
+
+
+def read_calibration(fname: str) -> CalibrationResults:
+    """Read a calibration from an ``.npz`` file, or a legacy pickle.
+
+    Raises ``ValueError`` if the file isn't a calibration this version can
+    read. Pickles can run arbitrary code when loaded, only read trusted ones.
+    """
+    if not fname.endswith(".npz"):
+        with open(fname, "rb") as f:
+            try:
+                legacy = pickle.load(f)
+                return normalized(CalibrationResults(*legacy))
+            except (pickle.UnpicklingError, EOFError, TypeError, AttributeError) as e:
+                raise ValueError("not a calibration pickle: {}".format(e))
+
+    try:
+        archive = np.load(fname, allow_pickle=False)
+    except zipfile.BadZipFile as e:
+        raise ValueError("not a calibration file: {}".format(e))
+    with archive:
+        try:
+            header = json.loads(str(archive["header"]))
+            if header.get("version") != FORMAT_VERSION:
+                raise ValueError(
+                    "unsupported calibration version: {}".format(header.get("version"))
+                )
+            results = CalibrationResults(
+                archive["camera_matrix"],
+                archive["dist_coeffs"],
+                [rvec.reshape(3, 1) for rvec in archive["rvecs"]],
+                [tvec.reshape(3, 1) for tvec in archive["tvecs"]],
+                header["fisheye"],
+                None if header["resolution"] is None else tuple(header["resolution"]),
+            )
+        except KeyError as e:
+            raise ValueError("not a calibration file: {}".format(e))
+    return normalized(results)
+
+
+def load_calibration(fname: str) -> CalibrationResults:
+    """Return the calibration in ``fname``, read once per modification."""
+    path = os.path.abspath(fname)
+    key = (path, os.stat(path).st_mtime_ns)
+    with _cache_lock:
+        results = _cache.get(key)
+        if results is None:
+            results = read_calibration(path)
+            # older versions of the same file are never needed again
+            for stale in [k for k in _cache if k[0] == path]:
+                del _cache[stale]
+            _cache[key] = results
+        return results
+
+
+def convert(src: str, dst: str, resolution: Tuple[int, int] = None):
+    """Rewrite the calibration in ``src`` to ``dst`` in the ``.npz`` format.
+
+    ``resolution`` is recorded if given, it isn't stored in legacy pickles.
+    """
+    results = read_calibration(src)
+    if resolution is not None:
+        results = results._replace(resolution=resolution)
+    save_calibration(dst, results)
+
+
+def _resolution(arg: str) -> Tuple[int, int]:
+    try:
+        width, height = (int(n) for n in arg.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WIDTHxHEIGHT, got " + arg)
+    return width, height
+
+
+def main(argv: List[str] = None):
+    ap = argparse.ArgumentParser(
+        description="Convert a calibration to the .npz calibration format."
+    )
+    ap.add_argument("source", help="calibration to convert, pickle or .npz")
+    ap.add_argument("output", help=".npz file to write")
+    ap.add_argument(
+        "--resolution",
+        type=_resolution,
+        default=None,
+        metavar="WxH",
+        help="resolution the camera was calibrated at",
+    )
+    args = ap.parse_args(argv)
+    if not args.output.endswith(".npz"):
+        ap.error("the output must be an .npz file")
+    convert(args.source, args.output, args.resolution)
+
+
+if __name__ == "__main__":
+    main()
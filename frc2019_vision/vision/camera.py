@@ -0,0 +1,97 @@
+"""Pixel to angle conversion from the camera calibration."""
+
+import threading
+
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from .calibration import CalibrationResults
+
+
+class CameraModel:
+    """Bearing of every pixel column and row of frames of one size.
+
+    Built once from the calibration, with the camera matrix scaled from the
+    resolution it was calibrated at to ``size``, and the lens distortion undone
+    along the principal row (for columns) and column (for rows). Converting a
+    pixel coordinate to an angle is then a table lookup, interpolated between
+    pixel centers.
+
+    Angles are in degrees, positive to the right of and below the optical axis.
+    """
+
+    def __init__(
+        self,
+        calibration: CalibrationResults,
+        size: Tuple[int, int],
+        calibrated_size: Tuple[int, int] = None,
+    ):
+        """``calibrated_size`` is the resolution the calibration is for if it
+        doesn't record one itself, ``size`` if neither is known."""
+        width, height = size
+        native_width, native_height = calibration.resolution or calibrated_size or size
+        camera_matrix = calibration.camera_matrix.copy()
+        camera_matrix[0] *= width / native_width
+        camera_matrix[1] *= height / native_height
+        center_x, center_y = camera_matrix[0, 2], camera_matrix[1, 2]
+
+        self.size = size
+        self.camera_matrix = camera_matrix
+        self._columns = np.arange(width, dtype=np.float64)
+        self._rows = np.arange(height, dtype=np.float64)
+        along_row = np.stack((self._columns, np.full(width, center_y)), axis=1)
+        along_column = np.stack((np.full(height, center_x), self._rows), axis=1)
+        self.column_angles = np.degrees(
+            np.arctan(self._normalize(along_row, calibration)[:, 0])
+        )
+        self.row_angles = np.degrees(
+            np.arctan(self._normalize(along_column, calibration)[:, 1])
+        )
+
+    def _normalize(self, points: np.array, calibration: CalibrationResults):
+        points = points.reshape(-1, 1, 2)
+        if calibration.fisheye:
+            normalized = cv2.fisheye.undistortPoints(
+                points, self.camera_matrix, calibration.dist_coeffs
+            )
+        else:
+            normalized = cv2.undistortPoints(
+                points, self.camera_matrix, calibration.dist_coeffs
+            )
+        return normalized.reshape(-1, 2)
+
+    def yaw(self, x):
+        """Horizontal angle of pixel column(s) ``x``."""
+        return np.interp(x, self._columns, self.column_angles)
+
+    def column(self, yaw):
+        """Pixel column(s) at horizontal angle(s) ``yaw``."""
+        return np.interp(yaw, self.column_angles, self._columns)
+
+    def pitch(self, y):
+        """Vertical angle of pixel row(s) ``y``."""
+        return np.interp(y, self._rows, self.row_angles)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def camera_model(
+    calibration: CalibrationResults,
+    size: Tuple[int, int],
+    calibrated_size: Tuple[int, int] = None,
+) -> CameraModel:
+    """Return the shared ``CameraModel`` of ``calibration`` for ``size``."""
+    key = (id(calibration), tuple(size), calibrated_size)
+    with _models_lock:
+        cached = _models.get(key)
+        if cached is None:
+            # the entry keeps the calibration alive, so its id can't be reused
+            cached = _models[key] = (
+                calibration,
+                CameraModel(calibration, size, calibrated_size),
+            )
+        return cached[1]
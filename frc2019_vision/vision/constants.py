@@ -31,9 +31,6 @@ BALL_RADIUS = 6.5
 CAMERA_ANGLE = 60
 """Field of view of the camera"""
 
-ARCTAN_30 = 1.537
-"""Arctan of 30"""
-
 VISION_TAPE_LENGTH_IN = 5.5
 """Length of the vision tape (inches)"""
 
@@ -168,12 +165,23 @@ VISION_TAPE_OBJECT_POINTS_RIGHT_SIDE = np.array(
     ]
 )
 
+VISION_TARGET_OBJECT_POINTS = np.concatenate(
+    (
+        VISION_TAPE_OBJECT_POINTS_LEFT_SIDE
+        + np.array([-VISION_TAPE_TOP_SEPARATION_FT / 2, 0, 0]),
+        VISION_TAPE_OBJECT_POINTS_RIGHT_SIDE
+        + np.array([VISION_TAPE_TOP_SEPARATION_FT / 2, 0, 0]),
+    )
+)
+"""Corners of both tapes, left then right, with the origin halfway between the
+top corners. Solving against all eight gives the pose of the whole target"""
+
 CAMERA_ID = int(0)
 """The id of the camera"""
 
-CALIBRATION_FILE_LOCATION = "{}/prod_camera_calib.pickle".format(
+CALIBRATION_FILE_LOCATION = "{}/prod_camera_calib.npz".format(
     os.path.dirname(__file__)
 )
-"""The path to the pickle containing the calibration information"""
+"""The path to the file containing the calibration information"""
 
 SUBPIXEL_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
@@ -0,0 +1,139 @@
+"""Pairing of tape candidates into vision targets.
+
+Every left-leaning candidate is scored against every right-leaning one at once
+with pairwise matrices. A pair looks like a target when the tapes are spaced as
+far apart as the real ones relative to their height, are about the same height
+and at the same level, lean by mirrored angles and have no other tape between
+them.
+"""
+
+import collections
+import math
+
+from typing import List
+
+import cv2
+import numpy as np
+
+from . import constants
+
+
+TapePair = collections.namedtuple("TapePair", ["left", "right", "centroid_x", "score"])
+"""Hulls of the left and right tape of a target, the x coordinate used to follow
+the target from frame to frame and a score between 0 and 1, higher is better"""
+
+EXPECTED_SPACING = float(
+    (
+        constants.VISION_TAPE_TOP_SEPARATION_FT
+        + constants.VISION_TAPE_OBJECT_POINTS_RIGHT_SIDE[:, 0].mean()
+        - constants.VISION_TAPE_OBJECT_POINTS_LEFT_SIDE[:, 0].mean()
+    )
+    / -constants.VISION_TAPE_ROTATED_HEIGHT_FT
+)
+"""Distance between the centers of the tapes of a target, in tape heights"""
+
+MAX_SPACING_ERROR = math.log(3)
+"""Turning the target shrinks the spacing, allow for up to about 70 degrees"""
+
+MAX_HEIGHT_ERROR = math.log(2)
+MAX_LEVEL_ERROR = 0.5
+"""Vertical offset between the tape centers, in tape heights"""
+
+MAX_TILT_ERROR = 0.5
+"""Difference between the (mirrored) tilts of the tapes, in radians"""
+
+MAX_LEAN_ERROR = math.radians(7)
+"""How far each tape may lean from the angle it is mounted at, in radians"""
+
+
+def _centroid_x(hull: np.array) -> int:
+    # same as the centroid the pipeline has always tracked targets by
+    all_x = hull.reshape((-1, 2))[:, 0]
+    return int(np.sum(all_x) / all_x.shape)
+
+
+def tape_features(hulls: List[np.array]) -> dict:
+    """Center, height and tilt of every hull, as arrays.
+
+    Tilt is the angle of the long side of the hull's minimum area rectangle from
+    vertical, positive when the top leans right like the left tape of a target.
+    """
+    boxes = np.array([cv2.boxPoints(cv2.minAreaRect(hull)) for hull in hulls])
+    first = boxes[:, 1] - boxes[:, 0]
+    second = boxes[:, 2] - boxes[:, 1]
+    longer = np.where(
+        (np.hypot(*first.T) >= np.hypot(*second.T))[:, None], first, second
+    )
+    # make the long side point up, image y grows downwards
+    longer = np.where((longer[:, 1] > 0)[:, None], -longer, longer)
+
+    top = np.array([hull[:, 0, 1].min() for hull in hulls], dtype=np.float64)
+    bottom = np.array([hull[:, 0, 1].max() for hull in hulls], dtype=np.float64)
+    return {
+        "x": np.array([hull[:, 0, 0].mean() for hull in hulls]),
+        "y": (top + bottom) / 2,
+        "height": np.maximum(bottom - top, 1),
+        "tilt": np.arctan2(longer[:, 0], -longer[:, 1]),
+    }
+
+
+def pair_tapes(hulls: List[np.array]) -> List[TapePair]:
+    """Return every plausible target among the hulls, best score first.
+
+    A hull is only ever part of one target, pairs are taken greedily in score
+    order.
+    """
+    if len(hulls) < 2:
+        return []
+
+    features = tape_features(hulls)
+    x, y = features["x"], features["y"]
+    height, tilt = features["height"], features["tilt"]
+    left = np.flatnonzero(tilt > 0)
+    right = np.flatnonzero(tilt < 0)
+    if len(left) == 0 or len(right) == 0:
+        return []
+
+    # rows are left tapes, columns right tapes
+    dx = x[right][None, :] - x[left][:, None]
+    mean_height = (height[left][:, None] + height[right][None, :]) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spacing_error = np.abs(np.log(dx / mean_height / EXPECTED_SPACING))
+    height_error = np.abs(np.log(height[left][:, None] / height[right][None, :]))
+    level_error = np.abs(y[left][:, None] - y[right][None, :]) / mean_height
+    tilt_error = np.abs(tilt[left][:, None] + tilt[right][None, :])
+    lean = np.abs(np.abs(tilt) - constants.VISION_TAPE_ANGLE_FROM_VERT_RAD)
+    lean_error = np.maximum(lean[left][:, None], lean[right][None, :])
+
+    # a real target never has another tape between its two, at the same level
+    level = (y[left][:, None] + y[right][None, :]) / 2
+    between = np.count_nonzero(
+        (x[left][:, None, None] < x)
+        & (x < x[right][None, :, None])
+        & (np.abs(y - level[..., None]) < mean_height[..., None] / 2),
+        axis=2,
+    )
+
+    plausible = (
+        (dx > 0)
+        & (spacing_error < MAX_SPACING_ERROR)
+        & (height_error < MAX_HEIGHT_ERROR)
+        & (level_error < MAX_LEVEL_ERROR)
+        & (tilt_error < MAX_TILT_ERROR)
+        & (lean_error < MAX_LEAN_ERROR)
+        & (between == 0)
+    )
+    error = spacing_error + height_error + level_error + tilt_error
+
+    pairs = []
+    used = set()
+    rows, cols = np.nonzero(plausible)
+    for k in np.argsort(error[rows, cols], kind="stable"):
+        i, j = left[rows[k]], right[cols[k]]
+        if i in used or j in used:
+            continue
+        used.update((i, j))
+        centroid_x = _centroid_x(np.concatenate((hulls[i], hulls[j])))
+        score = 1 / (1 + float(error[rows[k], cols[k]]))
+        pairs.append(TapePair(hulls[i], hulls[j], centroid_x, score))
+    return pairs
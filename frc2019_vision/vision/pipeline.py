@@ -1,7 +1,6 @@
 import collections
+import logging
 import math
-import os
-import pickle
 
 from typing import List, Optional, Tuple
 
@@ -10,12 +9,16 @@ import imutils
 import numpy as np
 
 from . import constants
+from .calibration import CalibrationResults, load_calibration, save_calibration
+from .camera import camera_model
+from .pairing import EXPECTED_SPACING, TapePair, pair_tapes
+from .threshold import ThresholdTable
+from .timing import TIMINGS, StageTimings
+from .tracker import TrackedPose
+from .workspace import Workspace
 
 
-CalibrationResults = collections.namedtuple(
-    "CalibrationResults", ["camera_matrix", "dist_coeffs", "rvecs", "tvecs", "fisheye"]
-)
-CalibrationResults.__new__.__defaults__ = (False,)
+logger = logging.getLogger(__name__)
 
 PipelineResults = collections.namedtuple(
     "PipelineResults",
@@ -23,10 +26,30 @@ PipelineResults = collections.namedtuple(
 )
 
 PoseEstimation = collections.namedtuple(
-    "PoseEstimation", ["left_rvec", "left_tvec", "right_rvec", "right_tvec"]
+    "PoseEstimation",
+    ["left_rvec", "left_tvec", "right_rvec", "right_tvec", "reprojection_error"],
 )
+"""Pose of each tape, or of the whole target twice over when both are solved
+together, with the RMS reprojection error of the corners in pixels"""
+PoseEstimation.__new__.__defaults__ = (None,)
 EulerAngles = collections.namedtuple("EulerAngles", ["left", "right"])
 
+TapeTracking = collections.namedtuple(
+    "TapeTracking", ["centroids", "roi", "misses", "pose"]
+)
+"""State the tape pipeline carries between frames: recent pair centroids, the
+``(x, y, w, h)`` region to search next (None for the whole frame), how many
+frames in a row the region came up empty and the ``(rvec, tvec)`` of the
+tracked target to start the next solve from"""
+TapeTracking.__new__.__defaults__ = (None,)
+
+TargetPosition = collections.namedtuple(
+    "TargetPosition", ["distance", "angle", "offset", "score", "bearing"]
+)
+"""Position of one visible target, as published for the tracked one, with the
+score of its tape pair and the horizontal angle (degrees) from the optical axis
+to the center of its corners"""
+
 PipelineResults._field_types = {
     "bitmask": np.array,
     "contours": List[np.array],
@@ -49,25 +72,145 @@ upper_green = np.array([101, 255, 255])
 lower_orange = np.array([3, 119, 138])
 upper_orange = np.array([31, 255, 255])
 
+THRESHOLD_RANGES = [(lower_green, upper_green), (lower_orange, upper_orange)]
+"""HSV ranges of the tape and the ball, in one lookup table shared by both"""
+TAPE_RANGE, BALL_RANGE = 0, 1
+
+CLOSING_KERNEL = np.ones((3, 3), dtype=np.uint8)
+
+CORNER_METHODS = ("extreme", "features", "polygon")
+"""Ways ``TapePipeline.get_corners`` can pick the corners of a tape"""
+CORNER_WINDOW = 5
+"""Half the side of the ``cornerSubPix`` search window"""
+POLYGON_EPSILONS = (0.02, 0.04, 0.06, 0.08, 0.1)
+"""``approxPolyDP`` tolerances tried in turn, as fractions of the perimeter"""
+
+MIN_SOLIDITY = 0.85
+"""Least fraction of its convex hull a tape candidate has to cover"""
+DOWNSCALED_MIN_SOLIDITY = 0.65
+"""Same, for candidates found on a downscaled frame (pyramid mode)"""
+
+POSE_MODES = ("tape", "target")
+"""Solve each tape's four corners separately, or all eight at once"""
+POSE_SOLVERS = ("iterative", "ippe", "warm")
+"""How the single target solve runs: Levenberg-Marquardt from scratch, the
+closed form planar solution, or Levenberg-Marquardt from the last frame's pose"""
+HAS_IPPE = hasattr(cv2, "SOLVEPNP_IPPE")
+"""The planar solution is new in OpenCV 4.1, the ``iterative`` solver is used
+instead on older versions"""
+
+MAX_PREDICTION_ERROR = 0.5
+"""How far a pair may be from where the tracker expects the target and still be
+taken for it, in distances between the tapes of the predicted target"""
+MAX_PREDICTED_HEIGHT_ERROR = math.log(1.5)
+"""How much taller or shorter than the tracker's distance implies each tape of a
+pair may be, as a log ratio"""
+
+
+def _height_error(pair: TapePair, height: float) -> float:
+    return max(
+        math.fabs(math.log(np.ptp(tape[:, 0, 1]) / height))
+        for tape in (pair.left, pair.right)
+    )
+
+
+def _odd(size: int) -> int:
+    """Largest odd kernel size no bigger than ``size``, at least 1."""
+    return max(size - (size + 1) % 2, 1)
+
+
+def _resize(image: np.array, width: int, height: int, dst: np.array) -> np.array:
+    return cv2.resize(image, (width, height), dst=dst, interpolation=cv2.INTER_AREA)
+
+
+def _downscale(image: np.array, scale: int, workspace: Workspace) -> np.array:
+    height, width = image.shape[:2]
+    height, width = height // scale, width // scale
+    dst = workspace.get("downscaled", (height, width) + image.shape[2:])
+    return _resize(image, width, height, dst)
+
 
 class BallPipeline:
+    """Finds the largest orange blob and estimates its distance and angle.
+
+    With ``scale`` above 1 the blob is searched for on a 1/scale image and only
+    the circle fit runs at full resolution, on a crop around the blob. With
+    ``lut`` the HSV conversion and range check are a single table lookup.
+
+    Distance and angle come from the angle the ball spans in the camera model
+    of the calibration, so they hold at any capture resolution.
+
+    Intermediate images live in a ``Workspace`` reused across frames, including
+    the resized frame returned by ``contour`` and ``measure``.
+    """
+
+    def __init__(
+        self,
+        timings: StageTimings = TIMINGS,
+        scale: int = 1,
+        lut: bool = False,
+        calib_fname: str = constants.CALIBRATION_FILE_LOCATION,
+    ):
+        self.timings = timings
+        self.scale = scale
+        self.threshold = ThresholdTable(THRESHOLD_RANGES) if lut else None
+        self.workspace = Workspace()
+        self.capture_size = None
+        self.set_calibration(calib_fname)
+
+    def set_calibration(self, calib_fname: str, generation: int = 0):
+        """Switch to the calibration in ``calib_fname``, see
+        ``TapePipeline.set_calibration``."""
+        self.calibration_info = load_calibration_results(calib_fname)
+        self.calibration = (calib_fname, generation)
+
     def contour(self, frame):
         # resize the frame, blur it, and convert it to the HSV
         # color space
-        frame = imutils.resize(frame, width=800)
-        blurred = cv2.blur(frame, (27, 27))
-        hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
+        self.capture_size = (frame.shape[1], frame.shape[0])
+        height = int(frame.shape[0] * 800 / frame.shape[1])
+        resized = self.workspace.get("frame", (height, 800) + frame.shape[2:])
+        frame = _resize(frame, 800, height, resized)
+        if self.scale == 1:
+            return frame, self.find_contours(frame, 27)
+
+        small = _downscale(frame, self.scale, self.workspace)
+        cnts = self.find_contours(small, _odd(27 // self.scale))
+        if not cnts:
+            return frame, cnts
+
+        # fit the circle on a full resolution crop around the biggest blob, with
+        # room for the blur
+        x, y, w, h = np.array(cv2.boundingRect(max(cnts, key=cv2.contourArea)))
+        x, y, w, h = x * self.scale, y * self.scale, w * self.scale, h * self.scale
+        pad = 27 + self.scale
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        crop = frame[y0 : y + h + pad, x0 : x + w + pad]
+        return frame, self.find_contours(crop, 27, offset=(x0, y0))
+
+    def find_contours(self, frame, blur_size: int, offset=(0, 0)):
+        workspace = self.workspace
+        blurred = cv2.blur(
+            frame, (blur_size, blur_size), dst=workspace.like("blurred", frame)
+        )
 
         # construct a mask for the color "green", then perform
         # a series of dilations and erosions to remove any small
         # blobs left in the mask
-        mask = cv2.inRange(hsv, lower_orange, upper_orange)
+        mask = workspace.get("mask", frame.shape[:2])
+        if self.threshold is not None:
+            mask = self.threshold.mask(blurred, BALL_RANGE, dst=mask)
+        else:
+            hsv = cv2.cvtColor(
+                blurred, cv2.COLOR_BGR2HSV, dst=workspace.like("hsv", frame)
+            )
+            mask = cv2.inRange(hsv, lower_orange, upper_orange, dst=mask)
         # find contours in the mask and initialize the current
         # (x, y) center of the ball
-        cnts = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cnts = imutils.grab_contours(cnts)
-
-        return frame, cnts
+        cnts = cv2.findContours(
+            mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset
+        )
+        return imutils.grab_contours(cnts)
 
     def detect_ball(self, frame, cnts):
         center = None
@@ -94,295 +237,734 @@ class BallPipeline:
                 cv2.circle(frame, (int(x), int(y)), int(radius), (0, 255, 255), 2)
                 cv2.circle(frame, center, 5, (0, 0, 255), -1)
 
-            rpixel = radius
-            ypixel = constants.SCREEN_WIDTH / 2
-            yinch = (ypixel * constants.BALL_RADIUS) / rpixel
-            calibration = 1.5
-            xinch = (yinch * constants.ARCTAN_30) * calibration
-
-            centerx = x
-            dpixel = centerx - 400
-            dinch = (dpixel * constants.BALL_RADIUS) / rpixel
-            alpha = (math.atan(dinch / xinch)) * 57.296
+            # the frame was resized from the capture, which the calibration is
+            # for unless it says otherwise
+            camera = camera_model(
+                self.calibration_info,
+                (frame.shape[1], frame.shape[0]),
+                self.capture_size,
+            )
+            left, alpha, right = camera.yaw((x - radius, x, x + radius))
+            angular_radius = math.radians(right - left) / 2
+            if angular_radius <= 0:
+                return frame, None, None
+            xinch = constants.BALL_RADIUS / math.sin(angular_radius)
 
-            return frame, xinch, alpha
+            return frame, xinch, float(alpha)
         else:
             return frame, None, None
 
     def ball_val(self, frame):
-        frame, cnts = self.contour(frame)
-        frame, dist, angle = self.detect_ball(frame, cnts)
+        with self.timings.stage("ball.total"):
+            with self.timings.stage("ball.contour"):
+                frame, cnts = self.contour(frame)
+            with self.timings.stage("ball.detect_ball"):
+                frame, dist, angle = self.detect_ball(frame, cnts)
         return frame, dist, angle
 
+    def measure(self, frame, annotate: bool = False):
+        """Return the annotated frame, distance, angle and lateral offset.
+
+        ``frame`` is never modified, the ball is drawn on a resized copy.
+        """
+        frame, dist, angle = self.ball_val(frame)
+        return frame, dist, angle, None
+
+    def tracking_state(self):
+        return None
+
+    def restore_tracking_state(self, state):
+        pass
+
 
 class TapePipeline:
-    def __init__(self, calib_fname: str = None):
+    """Finds the vision tape pair and estimates its pose.
+
+    With ``track_roi``, once a pair has been found only a region around it is
+    processed in the next frame: the pair's bounding box padded by
+    ``roi_padding`` times its larger side. Every miss grows the region by
+    ``roi_growth``, and after ``max_misses`` misses in a row the whole frame is
+    searched again. Targets outside the region go unseen meanwhile, so
+    ``visible_targets`` only lists every target in view without it.
+
+    With ``scale`` above 1 the tape is segmented and searched for on a 1/scale
+    image, and only the corners are refined at full resolution, on a crop
+    around the pair, so the pose matches a full resolution search
+    (tests/test_pyramid.py). At 1/4 thin tape is harder to tell apart from
+    noise and is missed more often. With ``lut`` the HSV conversion and range
+    check are a single table lookup. ``corner_method`` is one of
+    ``CORNER_METHODS`` and may be changed between frames.
+
+    ``pose_mode`` picks between a pose per tape, averaged, and a single solve of
+    the whole target using ``pose_solver``, ``ippe`` falling back to
+    ``iterative`` without ``HAS_IPPE``. Poses whose reprojection error is over
+    ``max_reprojection_error`` pixels are dropped.
+
+    Every plausible tape pair in view is measured into ``visible_targets``,
+    best score first; the one closest to the recently tracked pairs is the one
+    ``measure`` returns. While ``prediction`` holds the tracker's pose of the
+    target for the frame, only pairs near where it puts the target are taken
+    for it.
+
+    Intermediate images live in a ``Workspace`` reused across frames, so the
+    ``bitmask`` of a ``PipelineResults`` is only valid until the next frame.
+    """
+
+    def __init__(
+        self,
+        calib_fname: str = None,
+        timings: StageTimings = TIMINGS,
+        track_roi: bool = False,
+        roi_padding: float = 0.5,
+        roi_growth: float = 1.5,
+        max_misses: int = 3,
+        scale: int = 1,
+        lut: bool = False,
+        corner_method: str = "extreme",
+        pose_mode: str = "target",
+        pose_solver: str = "ippe",
+        max_reprojection_error: float = None,
+    ):
+        if corner_method not in CORNER_METHODS:
+            raise ValueError("unknown corner method: {}".format(corner_method))
+        if pose_mode not in POSE_MODES:
+            raise ValueError("unknown pose mode: {}".format(pose_mode))
+        if pose_solver not in POSE_SOLVERS:
+            raise ValueError("unknown pose solver: {}".format(pose_solver))
+        if pose_solver == "ippe" and not HAS_IPPE:
+            logger.warning(
+                "OpenCV %s has no IPPE solver, using iterative", cv2.__version__
+            )
+            pose_solver = "iterative"
+        self.timings = timings
+        self.corner_method = corner_method
+        self.pose_mode = pose_mode
+        self.pose_solver = pose_solver
+        self.max_reprojection_error = max_reprojection_error
+        self.last_pose = None
         self.last_centroid_x = []
+        self.prediction: Optional[TrackedPose] = None
         self.width = 0
         self.height = 0
+        self.track_roi = track_roi
+        self.roi_padding = roi_padding
+        self.roi_growth = roi_growth
+        self.max_misses = max_misses
+        self.roi = None
+        self.misses = 0
+        self.pairs: List[TapePair] = []
+        self.visible_targets: List[TargetPosition] = []
+        self.scale = scale
+        self.threshold = ThresholdTable(THRESHOLD_RANGES) if lut else None
+        self.workspace = Workspace()
         if calib_fname is None:
             raise TypeError("calib_fname (argument 2) must be str, not None")
+        self.set_calibration(calib_fname)
+
+    def set_calibration(self, calib_fname: str, generation: int = 0):
+        """Switch to the calibration in ``calib_fname``.
+
+        ``generation`` tells apart reloads of the same file, see
+        ``workers.configure``.
+        """
         self.calibration_info = load_calibration_results(calib_fname)
+        self.calibration = (calib_fname, generation)
+        self.last_pose = None
 
-    def process_image(self, image: np.array) -> PipelineResults:
+    def reset(self):
+        """Forget tracking state, e.g. after switching back to this target."""
+        self.last_centroid_x = []
+        self.roi = None
+        self.misses = 0
+        self.pairs = []
+        self.visible_targets = []
+        self.last_pose = None
+
+    def tracking_state(self) -> TapeTracking:
+        """Return the state carried from one frame to the next."""
+        return TapeTracking(
+            list(self.last_centroid_x), self.roi, self.misses, self.last_pose
+        )
 
-        bitmask = self.generate_bitmask_camera(image)
-        contours, trash_contours = self.get_contours(bitmask)
-        frame = cv2.drawContours(image, contours[:1], -1, (255, 0, 0), thickness=3)
+    def restore_tracking_state(self, state: TapeTracking):
+        if state is None:
+            self.reset()
+            return
+        self.last_centroid_x = list(state.centroids)
+        self.roi = state.roi
+        self.misses = state.misses
+        self.last_pose = state.pose
+
+    def measure(self, image: np.array, annotate: bool = False):
+        """Return the frame, distance, angle and lateral offset.
+
+        ``image`` is never modified. With ``annotate`` the detected tape is drawn
+        on a copy of it, which is returned instead.
+        """
+        pipeline_result = self.process_image(image)
+        contours = getattr(pipeline_result, "contours", None)
+        if annotate and contours:
+            image = cv2.drawContours(
+                image.copy(), contours[:1], -1, (255, 0, 0), thickness=3
+            )
 
-        if len(contours) < 2:
-            return frame, None, None
+        pose_estimation = getattr(pipeline_result, "pose_estimation", None)
+        if pose_estimation is None:
+            return image, None, None, None
+        return (image,) + self.position(pose_estimation, pipeline_result.euler_angles)
+
+    @staticmethod
+    def position(
+        pose_estimation: PoseEstimation, euler_angles: EulerAngles
+    ) -> Tuple[float, float, float]:
+        """Distance, angle (degrees) and lateral offset of a tape pair's pose."""
+        tvecs = (pose_estimation.left_tvec + pose_estimation.right_tvec) / 2
+        euler_angles = (euler_angles.left + euler_angles.right) / 2
+
+        # tvecs[2][0] for distance from plane to plane
+        # tvecs[0][0] for lateral distance
+        # np.linalg.norm(tvecs) for euclidean distance
+        # euler angle contains [x,y,z] (radians)
+        return tvecs[2][0], math.degrees(euler_angles[1]), tvecs[0][0]
 
-        corners_subpixel = self.get_corners(contours, bitmask)
+    def process_image(self, image: np.array) -> PipelineResults:
+        roi = self.roi if self.track_roi else None
+        # tracking and full-frame searches are timed separately so the gain from
+        # the ROI shows up in the stats
+        mode = "tape.track" if roi is not None else "tape.search"
+        with self.timings.stage("tape.total"), self.timings.stage(mode):
+            result = self._process_image(image, roi)
+        if self.track_roi:
+            self.update_roi(getattr(result, "contours", None))
+        return result
+
+    def _process_image(self, image: np.array, roi=None) -> PipelineResults:
+        timings = self.timings
+        self.height, self.width = image.shape[:2]
+
+        region, offset = image, (0, 0)
+        if roi is not None:
+            x, y, w, h = roi
+            region = image[y : y + h, x : x + w]
+            offset = (x, y)
+
+        if self.scale > 1:
+            with timings.stage("tape.downscale"):
+                region = _downscale(region, self.scale, self.workspace)
+            bitmask = self.generate_bitmask_camera(region, _odd(7 // self.scale))
+        else:
+            bitmask = self.generate_bitmask_camera(region)
+        with timings.stage("tape.get_contours"):
+            contours, trash_contours = self.get_contours(bitmask, offset, self.scale)
 
-        try:
-            result = self.estimate_pose(corners_subpixel)
-            euler_angles = EulerAngles(
-                self.rodrigues_to_euler_angles(result.left_rvec),
-                self.rodrigues_to_euler_angles(result.right_rvec),
-            )
-        except (cv2.error, AttributeError):
-            result, euler_angles = None, None
+        if len(contours) < 2:
+            self.last_pose = None
+            # the tracked target may be out of sight while others are in view
+            with timings.stage("tape.other_targets"):
+                self.measure_targets(image, bitmask, offset)
+            return image, None, None
+
+        tracked = contours[0]
+        measured = self.measure_pair(image, contours, bitmask, offset, self.last_pose)
+        contours, corners_subpixel, result, euler_angles = measured
+        self.last_pose = None
+        if result is not None:
+            self.last_pose = (result.left_rvec, result.left_tvec)
+
+        with timings.stage("tape.other_targets"):
+            measured = (tracked, corners_subpixel, result, euler_angles)
+            self.measure_targets(image, bitmask, offset, measured)
 
         return PipelineResults(
             bitmask, trash_contours, contours, corners_subpixel, result, euler_angles
         )
 
-    def generate_bitmask_camera(self, image: np.array) -> np.array:
-        image = cv2.blur(image, (7, 7))
-        hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        im = cv2.inRange(hsv_image, lower_green, upper_green)
-        closing = cv2.morphologyEx(im, cv2.MORPH_CLOSE, np.ones((3, 3)))
-        return closing
-
-    def get_contours(self, bitmask: np.array) -> Tuple[List[np.array], List[np.array]]:
-        trash = []
-        contours = cv2.findContours(
-            bitmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-        )
-        contours = imutils.grab_contours(contours)
-        convex_hulls = [cv2.convexHull(contour) for contour in contours]
-        contour_hull_areas = [cv2.contourArea(hull) for hull in convex_hulls]
-
-        self.height = bitmask.shape[0]
-        self.width = bitmask.shape[1]
-        # print(height, width)
-
-        def not_touching_edge(cnt):
-            cnt = cnt.reshape((-1, 2))
-            top_index = cnt[:, 1].argmin()
-            bottom_index = cnt[:, 1].argmax()
-            left_index = cnt[:, 0].argmin()
-            right_index = cnt[:, 0].argmax()
-
-            top_y = cnt[top_index][1]
-            bot_y = cnt[bottom_index][1]
-            left_x = cnt[left_index][0]
-            right_x = cnt[right_index][0]
-
-            return (
-                top_y > 10
-                and bot_y < self.height - 10
-                and left_x > 10
-                and right_index < self.width - 10
-            )
-
-        is_candidate = []
-        for contour, contour_hull_area in zip(contours, contour_hull_areas):
-            if contour_hull_area > 10:
-                area = cv2.contourArea(contour)
-                if area / contour_hull_area > 0.85:
-                    _, _, w, h = cv2.boundingRect(contour)
-                    ratio = (
-                        -constants.VISION_TAPE_ROTATED_WIDTH_FT
-                        / constants.VISION_TAPE_ROTATED_HEIGHT_FT
+    def measure_targets(
+        self, image: np.array, bitmask: np.array, offset: Tuple[int, int], tracked=None
+    ):
+        """Measure every pair in ``pairs`` into ``visible_targets``.
+
+        ``tracked`` is the left hull, corners, pose and euler angles of the pair
+        already measured as the tracked target, which isn't measured again.
+        """
+        self.visible_targets = []
+        camera = camera_model(self.calibration_info, (self.width, self.height))
+        for pair in self.pairs:
+            if tracked is not None and pair.left is tracked[0]:
+                corners, pose, euler = tracked[1:]
+            else:
+                _, corners, pose, euler = self.measure_pair(
+                    image, [pair.left, pair.right], bitmask, offset
+                )
+            if pose is not None:
+                center_x = np.concatenate(corners).reshape(-1, 2)[:, 0].mean()
+                self.visible_targets.append(
+                    TargetPosition(
+                        *self.position(pose, euler),
+                        pair.score,
+                        float(camera.yaw(center_x)),
                     )
-                    if 0.5 * ratio <= w / h <= 1.5 * ratio:
-                        if not_touching_edge(contour):
-                            is_candidate.append(True)
-                            continue
-            is_candidate.append(False)
-            trash.append(contour)
-
-        candidates = [
-            convex_hulls[i] for i, contour in enumerate(contours) if is_candidate[i]
-        ]
-
-        def get_centroid_x(cnt):
-            all_x = cnt.reshape((-1, 2))[:, 0]
-            return int(np.sum(all_x) / all_x.shape)
-            # M = cv2.moments(cnt)
-            # return int(M["m10"] / M["m00"])
-
-        def is_tape_on_left_side(cnt):
-            min_area_box = np.int0(cv2.boxPoints(cv2.minAreaRect(cnt)))
-
-            left_box_point = min(min_area_box, key=lambda row: row[0])
-            right_box_point = max(min_area_box, key=lambda row: row[0])
-
-            return not left_box_point[1] < right_box_point[1]
-
-        candidates.sort(key=get_centroid_x)
-
-        if len(candidates) > 0:
-            try:
-                if not is_tape_on_left_side(candidates[0]):
-                    trash.append(candidates[0])
-                    del candidates[0]
-                if is_tape_on_left_side(candidates[-1]):
-                    trash.append(candidates[-1])
-                    del candidates[-1]
-            except Exception as e:
-                pass
+                )
 
-        if len(candidates) > 0:
-            try:
-                if not is_tape_on_left_side(candidates[0]):
-                    trash.append(candidates[0])
-                    del candidates[0]
-                    # print("removed leftmost for pointing to right")
-                if is_tape_on_left_side(candidates[-1]):
-                    trash.append(candidates[-1])
-                    del candidates[-1]
-                    # print("removed rightmost for pointing to left")
-            except Exception as e:
-                #
-                pass
+    def measure_pair(
+        self,
+        image: np.array,
+        contours: List[np.array],
+        bitmask: np.array,
+        offset: Tuple[int, int],
+        guess: Tuple[np.array, np.array] = None,
+    ):
+        """Return the contours, corners, pose and euler angles of a tape pair.
+
+        The contours are those found in ``bitmask``, refined to full resolution
+        in pyramid mode. Pose and angles are None if the pose can't be solved or
+        reprojects too far from the corners. ``guess`` is passed on to
+        ``estimate_pose``.
+        """
+        timings = self.timings
+        corner_bitmask, corner_offset = bitmask, offset
+        if self.scale > 1:
+            # cornerSubPix needs the full resolution edges, but only around the
+            # tape
+            with timings.stage("tape.refine_bitmask"):
+                pad = 10 + 2 * self.scale
+                x, y, w, h = cv2.boundingRect(np.concatenate(contours[:2]))
+                x, y, w, h = self._clip_roi(x - pad, y - pad, w + 2 * pad, h + 2 * pad)
+                corner_bitmask = self.generate_bitmask_camera(
+                    image[y : y + h, x : x + w], scratch="refine"
+                )
+                corner_offset = (x, y)
+                contours = self.refine_contours(contours, corner_bitmask, corner_offset)
 
-        if len(candidates) > 1:
-            contour_pair_centroids = {}
+        with timings.stage("tape.get_corners"):
+            corners_subpixel = self.get_corners(contours, corner_bitmask, corner_offset)
 
-            for i, left_cnt, right_cnt in zip(
-                range(len(candidates)), candidates[::2], candidates[1::2]
+        try:
+            with timings.stage("tape.estimate_pose"):
+                result = self.estimate_pose(corners_subpixel, guess)
+            if result is None:
+                return contours, corners_subpixel, None, None
+            if (
+                self.max_reprojection_error is not None
+                and result.reprojection_error > self.max_reprojection_error
             ):
-                centroid = get_centroid_x(np.concatenate((left_cnt, right_cnt)))
-                contour_pair_centroids[centroid] = i
-
-            if len(contour_pair_centroids) > 0:
-                if len(self.last_centroid_x) == 0:
-                    self.last_centroid_x.append(
-                        min(
-                            contour_pair_centroids.keys(),
-                            key=lambda x: np.math.fabs(self.width / 2 - x),
-                        )
-                    )
-                    avg_X = avg(self.last_centroid_x)
-                else:
-                    if len(self.last_centroid_x) > 5:
-                        del self.last_centroid_x[0]
-                    avg_X = avg(self.last_centroid_x)
-                    self.last_centroid_x.append(
-                        min(
-                            contour_pair_centroids.keys(),
-                            key=lambda x: np.math.fabs(avg_X - x),
-                        )
-                    )
+                return contours, corners_subpixel, None, None
+            with timings.stage("tape.euler_angles"):
+                euler_angles = EulerAngles(
+                    self.rodrigues_to_euler_angles(result.left_rvec),
+                    self.rodrigues_to_euler_angles(result.right_rvec),
+                )
+        except cv2.error:
+            result, euler_angles = None, None
 
-                pair_num = contour_pair_centroids[self.last_centroid_x[-1]]
+        return contours, corners_subpixel, result, euler_angles
 
-                left_index = pair_num * 2
-                right_index = left_index + 1
+    def refine_contours(
+        self, contours: List[np.array], bitmask: np.array, offset: Tuple[int, int]
+    ) -> List[np.array]:
+        """Swap the downscaled tape contours for their full resolution hulls."""
+        found = cv2.findContours(
+            bitmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset
+        )
+        found = imutils.grab_contours(found)
+        if not found:
+            return contours
+
+        centers = np.array([cnt.reshape(-1, 2).mean(axis=0) for cnt in found])
+        nearest = [
+            np.linalg.norm(centers - cnt.reshape(-1, 2).mean(axis=0), axis=1).argmin()
+            for cnt in contours[:2]
+        ]
+        if nearest[0] == nearest[1]:
+            # the pair merged at full resolution, keep the coarse outlines
+            return contours
+        return [cv2.convexHull(found[i]) for i in nearest]
+
+    def update_roi(self, contours: Optional[List[np.array]]):
+        """Pick the region to process in the next frame."""
+        if contours:
+            x, y, w, h = cv2.boundingRect(np.concatenate(contours[:2]))
+            pad = int(self.roi_padding * max(w, h))
+            self.roi = self._clip_roi(x - pad, y - pad, w + 2 * pad, h + 2 * pad)
+            self.misses = 0
+            return
+
+        if self.roi is None:
+            return
+        self.misses += 1
+        if self.misses > self.max_misses:
+            self.roi = None
+            self.misses = 0
+            return
+        x, y, w, h = self.roi
+        grown_w, grown_h = int(w * self.roi_growth), int(h * self.roi_growth)
+        self.roi = self._clip_roi(
+            x - (grown_w - w) // 2, y - (grown_h - h) // 2, grown_w, grown_h
+        )
 
-                trash.extend(candidates[:left_index])
-                trash.extend(candidates[right_index + 1 :])
-                candidates = [candidates[left_index], candidates[right_index]]
-                # scandidates.sort(key=get_centroid_x)
-                print(is_tape_on_left_side(candidates[0]))
+    def _clip_roi(self, x: int, y: int, w: int, h: int):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+    def generate_bitmask_camera(
+        self, image: np.array, blur_size: int = 7, scratch: str = "frame"
+    ) -> np.array:
+        """Threshold ``image`` into the ``scratch`` buffers of the workspace."""
+        timings = self.timings
+        workspace = self.workspace
+        mask_shape = image.shape[:2]
+        with timings.stage("tape.blur"):
+            if blur_size > 1:
+                image = cv2.blur(
+                    image,
+                    (blur_size, blur_size),
+                    dst=workspace.like(scratch + ".blurred", image),
+                )
+        im = workspace.get(scratch + ".mask", mask_shape)
+        if self.threshold is not None:
+            with timings.stage("tape.threshold"):
+                im = self.threshold.mask(image, TAPE_RANGE, dst=im)
+        else:
+            with timings.stage("tape.hsv"):
+                hsv_image = cv2.cvtColor(
+                    image,
+                    cv2.COLOR_BGR2HSV,
+                    dst=workspace.like(scratch + ".hsv", image),
+                )
+            with timings.stage("tape.in_range"):
+                im = cv2.inRange(hsv_image, lower_green, upper_green, dst=im)
+        with timings.stage("tape.morphology"):
+            closing = cv2.morphologyEx(
+                im,
+                cv2.MORPH_CLOSE,
+                CLOSING_KERNEL,
+                dst=workspace.get(scratch + ".closing", mask_shape),
+            )
+        return closing
 
-                return candidates, trash  # left guaranteed to be first
+    def filter_candidates(
+        self, bitmask: np.array, offset: Tuple[int, int] = (0, 0), scale: int = 1
+    ) -> Tuple[List[np.array], List[np.array]]:
+        """Return the convex hulls of the blobs shaped like a piece of tape, and
+        the contours of every other blob.
+
+        The extreme points, areas and aspect ratios of all contours are computed
+        at once from their concatenated points, and hulls are only built for
+        the contours passing every test that doesn't need one. Arguments are the
+        same as for ``get_contours``.
+        """
+        if scale == 1:
+            contours = cv2.findContours(
+                bitmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset
+            )
+            contours = imutils.grab_contours(contours)
+        else:
+            contours = cv2.findContours(
+                bitmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+            )
+            # map every downscaled pixel to the center of the pixels it covers
+            shift = np.array(offset, dtype=np.int32) + scale // 2
+            contours = [c * scale + shift for c in imutils.grab_contours(contours)]
+        if not contours:
+            return [], []
+
+        # every contour's points back to back, with the index each one starts at
+        lengths = np.array([len(contour) for contour in contours])
+        starts = np.zeros_like(lengths)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+        x, y = points[:, 0], points[:, 1]
+
+        left_x = np.minimum.reduceat(x, starts)
+        right_x = np.maximum.reduceat(x, starts)
+        top_y = np.minimum.reduceat(y, starts)
+        bot_y = np.maximum.reduceat(y, starts)
+        # same as the width and height of cv2.boundingRect
+        width = right_x - left_x + 1
+        height = bot_y - top_y + 1
+
+        # shoelace formula, like cv2.contourArea
+        following = np.arange(1, len(points) + 1)
+        following[starts + lengths - 1] = starts
+        cross = x * y[following] - x[following] * y
+        area = np.abs(np.add.reduceat(cross, starts)) / 2
+
+        # tape cut off by the edge of the processed region can't be trusted
+        left_edge, top_edge = offset
+        right_edge = left_edge + bitmask.shape[1] * scale
+        bottom_edge = top_edge + bitmask.shape[0] * scale
+
+        ratio = (
+            -constants.VISION_TAPE_ROTATED_WIDTH_FT
+            / constants.VISION_TAPE_ROTATED_HEIGHT_FT
+        )
+        aspect = width / height
+        is_candidate = (
+            # the hull fits in the box through the outermost pixels, and has to
+            # be over 10 px with the contour covering 85% of it
+            ((width - 1) * (height - 1) > 10)
+            & (area > 0.85 * 10)
+            & (0.5 * ratio <= aspect)
+            & (aspect <= 1.5 * ratio)
+            & (top_y > top_edge + 10)
+            & (bot_y < bottom_edge - 10)
+            & (left_x > left_edge + 10)
+            & (right_x < right_edge - 10)
+        )
+
+        # a slanted tape only a few pixels wide turns into a staircase once
+        # downscaled, which covers much less of its hull
+        min_solidity = MIN_SOLIDITY if scale == 1 else DOWNSCALED_MIN_SOLIDITY
+        candidates = []
+        for i in np.flatnonzero(is_candidate):
+            hull = cv2.convexHull(contours[i])
+            hull_area = cv2.contourArea(hull)
+            if hull_area > 10 and area[i] / hull_area > min_solidity:
+                candidates.append(hull)
+            else:
+                is_candidate[i] = False
+        trash = [contours[i] for i in np.flatnonzero(~is_candidate)]
+        return candidates, trash
+
+    def get_contours(
+        self, bitmask: np.array, offset: Tuple[int, int] = (0, 0), scale: int = 1
+    ) -> Tuple[List[np.array], List[np.array]]:
+        """Find the tape pair in ``bitmask``.
+
+        ``bitmask`` may be a region of the frame whose top left corner is at
+        ``offset``, downscaled by ``scale``. The returned contours are always in
+        full resolution frame coordinates.
+
+        Every plausible pair is kept in ``pairs``, best score first. The one
+        returned is the pair closest to the center of the frame, or once a pair
+        is being tracked, to the average of the recently returned ones. With a
+        ``prediction`` it is the pair closest to the predicted position instead,
+        and none if no pair is within ``MAX_PREDICTION_ERROR`` of it with both
+        tapes about as tall as the predicted distance makes them.
+        """
+        candidates, trash = self.filter_candidates(bitmask, offset, scale)
+        self.pairs = pair_tapes(candidates)
+
+        pairs = self.pairs
+        predicted = self.predicted_pair()
+        if predicted is not None:
+            avg_X, height = predicted
+            pairs = [
+                pair
+                for pair in pairs
+                if math.fabs(avg_X - pair.centroid_x)
+                < MAX_PREDICTION_ERROR * EXPECTED_SPACING * height
+                and _height_error(pair, height) < MAX_PREDICTED_HEIGHT_ERROR
+            ]
+        elif len(self.last_centroid_x) == 0:
+            avg_X = self.width / 2
+        else:
+            if len(self.last_centroid_x) > 5:
+                del self.last_centroid_x[0]
+            avg_X = avg(self.last_centroid_x)
+
+        if pairs:
+            pair = min(pairs, key=lambda pair: math.fabs(avg_X - pair.centroid_x))
+            self.last_centroid_x.append(pair.centroid_x)
+
+            trash.extend(
+                cnt
+                for cnt in candidates
+                if cnt is not pair.left and cnt is not pair.right
+            )
+            return [pair.left, pair.right], trash  # left guaranteed to be first
 
         self.last_centroid_x = []
         return [], candidates + trash
 
+    def predicted_pair(self) -> Optional[Tuple[float, float]]:
+        """Column the tracker's ``prediction`` puts the target at and the height
+        of its tapes in pixels, if there is a prediction."""
+        prediction = self.prediction
+        if prediction is None or prediction.offset is None:
+            return None
+        if prediction.distance <= 0:
+            # extrapolated through the camera
+            return None
+        camera = camera_model(self.calibration_info, (self.width, self.height))
+        bearing = math.degrees(math.atan2(prediction.offset, prediction.distance))
+        height = (
+            camera.camera_matrix[1, 1]
+            * -constants.VISION_TAPE_ROTATED_HEIGHT_FT
+            / prediction.distance
+        )
+        return float(camera.column(bearing)), height
+
     def get_corners(
-        self, contours: List[np.array], bitmask: np.array
+        self,
+        contours: List[np.array],
+        bitmask: np.array,
+        offset: Tuple[int, int] = (0, 0),
+        method: str = None,
     ) -> List[np.array]:
+        """Return the top, inner, outer and bottom corners of both tapes.
+
+        Corners are found with ``method`` (``corner_method`` by default) and
+        refined together in one ``cornerSubPix`` call, all on a crop of
+        ``bitmask`` just around the pair, so the cost depends on the size of the
+        tape and not of the frame. The result is in frame coordinates.
+        """
+        find_corners = getattr(self, "corners_" + (method or self.corner_method))
+
+        # crop to the pair, with room for the refinement window to move
+        pad = CORNER_WINDOW + 3
+        x, y, w, h = cv2.boundingRect(np.concatenate(contours[:2]))
+        x0, y0 = max(x - offset[0] - pad, 0), max(y - offset[1] - pad, 0)
+        x1 = min(x - offset[0] + w + pad, bitmask.shape[1])
+        y1 = min(y - offset[1] + h + pad, bitmask.shape[0])
+        crop = bitmask[y0:y1, x0:x1]
+        origin = np.array([offset[0] + x0, offset[1] + y0], dtype=np.int32)
+
+        corners = np.array(
+            [find_corners(cnt.reshape(-1, 2) - origin) for cnt in contours[:2]],
+            dtype=np.float32,
+        ).reshape(-1, 1, 2)
+        # corners rebuilt from lines may land off the crop
+        np.clip(corners, 0, np.float32(crop.shape[::-1]) - 1, out=corners)
+        cv2.cornerSubPix(
+            crop,
+            corners,
+            (CORNER_WINDOW, CORNER_WINDOW),
+            (-1, -1),
+            constants.SUBPIXEL_CRITERIA,
+        )
+        corners += origin.astype(np.float32)
+        return [corners[:4], corners[4:]]
+
+    @staticmethod
+    def corners_extreme(cnt: np.array) -> List[np.array]:
+        """The topmost, leftmost, rightmost and bottommost points of ``cnt``."""
+        top_index = cnt[:, 1].argmin()
+        bottom_index = cnt[:, 1].argmax()
+        left_index = cnt[:, 0].argmin()
+        right_index = cnt[:, 0].argmax()
+
+        top_point = cnt[top_index]
+        bot_point = cnt[bottom_index]
+        left_point = cnt[left_index]
+        right_point = cnt[right_index]
+
+        if left_point[1] > right_point[1]:
+            return top_point, right_point, left_point, bot_point
+        else:
+            return top_point, left_point, right_point, bot_point
+
+    def corners_features(self, cnt: np.array) -> List[np.array]:
+        """Corners from ``goodFeaturesToTrack`` on the filled contour, with the
+        bottom corner rebuilt from the sides meeting at it."""
+
+        def removearray(L, arr):
+            ind = 0
+            size = len(L)
+            while ind != size and not np.array_equal(L[ind], arr):
+                ind += 1
+            if ind != size:
+                L.pop(ind)
+            else:
+                raise ValueError("array not found in list.")
+
+        # draw into a blank just big enough for this tape
+        pad = 2
+        x, y, w, h = cv2.boundingRect(cnt)
+        origin = np.array([x - pad, y - pad])
+        blank = self.workspace.get("corner_blank", (h + 2 * pad, w + 2 * pad))
+        blank.fill(0)
+        cv2.drawContours(blank, [cnt - origin], -1, (255,), thickness=cv2.FILLED)
+        dst = cv2.goodFeaturesToTrack(
+            image=blank, maxCorners=5, qualityLevel=0.16, minDistance=15
+        )
+        if dst is None or len(dst) < 5:
+            return self.corners_extreme(cnt)
 
-        contours = [x.reshape(-1, 2) for x in contours[:2]]
-
-        def get_corners_intpixel_alternate(cnt):
-            def removearray(L, arr):
-                ind = 0
-                size = len(L)
-                while ind != size and not np.array_equal(L[ind], arr):
-                    ind += 1
-                if ind != size:
-                    L.pop(ind)
-                else:
-                    raise ValueError("array not found in list.")
-
-            blank = np.zeros(bitmask.shape).astype(np.uint8)
-            cv2.drawContours(blank, [cnt], -1, (255,), thickness=cv2.FILLED)
-            dst = cv2.goodFeaturesToTrack(
-                image=blank, maxCorners=5, qualityLevel=0.16, minDistance=15
-            ).reshape(-1, 2)
-            if len(dst) < 5:
-                return get_corners_intpixel(cnt)
-
-            points = list(dst)
+        points = list(dst.reshape(-1, 2) + origin)
 
-            top_point = min(points, key=lambda x: x[1])
-            removearray(points, top_point)
+        top_point = min(points, key=lambda x: x[1])
+        removearray(points, top_point)
 
-            fake_bottom_point = max(points, key=lambda x: x[1])
-            removearray(points, fake_bottom_point)
+        fake_bottom_point = max(points, key=lambda x: x[1])
+        removearray(points, fake_bottom_point)
 
-            left_point = min(points, key=lambda x: x[0])
-            removearray(points, left_point)
+        left_point = min(points, key=lambda x: x[0])
+        removearray(points, left_point)
 
-            right_point = max(points, key=lambda x: x[0])
-            removearray(points, right_point)
+        right_point = max(points, key=lambda x: x[0])
+        removearray(points, right_point)
 
-            leftover_point = points[0]
+        leftover_point = points[0]
 
-            top_point, inner_pt, outer_pt, _ = get_corners_intpixel(cnt)
+        top_point, inner_pt, outer_pt, _ = self.corners_extreme(cnt)
 
-            if left_point[1] > right_point[1]:
-                inner_pt, outer_pt = right_point, left_point
-            else:
-                inner_pt, outer_pt = left_point, right_point
+        if left_point[1] > right_point[1]:
+            inner_pt, outer_pt = right_point, left_point
+        else:
+            inner_pt, outer_pt = left_point, right_point
 
+        try:
             bot_point = constants.line_intersect(
                 inner_pt, leftover_point, outer_pt, fake_bottom_point
             )
+        except np.linalg.LinAlgError:
+            return self.corners_extreme(cnt)
+
+        return top_point, inner_pt, outer_pt, bot_point
+
+    @staticmethod
+    def corners_polygon(cnt: np.array) -> List[np.array]:
+        """The vertices of a 4 sided ``approxPolyDP`` fit of the hull of ``cnt``.
+
+        Noise along a side can't pull a corner off the tape the way it can an
+        extreme point. Falls back to the extreme points if no 4 sided fit is
+        found.
+        """
+        hull = cv2.convexHull(cnt.reshape(-1, 1, 2).astype(np.int32))
+        perimeter = cv2.arcLength(hull, True)
+        for epsilon in POLYGON_EPSILONS:
+            polygon = cv2.approxPolyDP(hull, epsilon * perimeter, True)
+            if len(polygon) <= 4:
+                break
+        if len(polygon) != 4:
+            return TapePipeline.corners_extreme(cnt)
+
+        polygon = polygon.reshape(-1, 2)
+        by_y = polygon[np.argsort(polygon[:, 1], kind="stable")]
+        top_point, bot_point = by_y[0], by_y[3]
+        left_point, right_point = sorted(by_y[1:3], key=lambda point: point[0])
+
+        if left_point[1] > right_point[1]:
+            return top_point, right_point, left_point, bot_point
+        else:
+            return top_point, left_point, right_point, bot_point
+
+    def estimate_pose(
+        self,
+        corners_subpixel: List[np.array],
+        guess: Tuple[np.array, np.array] = None,
+    ) -> PoseEstimation:
+        """Solve the pose from the corners of both tapes, as ``pose_mode`` says.
+
+        ``guess`` is an ``(rvec, tvec)`` of the same target in an earlier frame,
+        which the ``warm`` solver starts from.
+        """
+        if self.pose_mode == "target":
+            result = self.estimate_target_pose(corners_subpixel, guess)
+        else:
+            result = self.estimate_tape_poses(corners_subpixel)
+        if result is None:
+            return None
+        return result._replace(
+            reprojection_error=self.reprojection_error(result, corners_subpixel)
+        )
 
-            return top_point, inner_pt, outer_pt, bot_point
-
-        def get_corners_intpixel(cnt):
-            top_index = cnt[:, 1].argmin()
-            bottom_index = cnt[:, 1].argmax()
-            left_index = cnt[:, 0].argmin()
-            right_index = cnt[:, 0].argmax()
-
-            top_point = cnt[top_index]
-            bot_point = cnt[bottom_index]
-            left_point = cnt[left_index]
-            right_point = cnt[right_index]
-
-            if left_point[1] > right_point[1]:
-                return top_point, right_point, left_point, bot_point
-            else:
-                return top_point, left_point, right_point, bot_point
-
-        corners = [
-            np.array(get_corners_intpixel(cnt)).reshape((-1, 1, 2)) for cnt in contours
-        ]
-
-        corners_subpixel = [
-            cv2.cornerSubPix(
-                bitmask,
-                corner.astype(np.float32),
-                (5, 5),
-                (-1, -1),
-                constants.SUBPIXEL_CRITERIA,
-            )
-            for corner in corners
-        ]
-
-        return corners_subpixel
-
-    def estimate_pose(self, corners_subpixel: List[np.array]) -> PoseEstimation:
-
+    def estimate_tape_poses(self, corners_subpixel: List[np.array]) -> PoseEstimation:
+        """Solve each tape's four corners on its own."""
         result = {"left": None, "right": None}
 
         for name, corners, objp in zip(
@@ -421,6 +1003,80 @@ class TapePipeline:
         except TypeError:
             return None
 
+    def estimate_target_pose(
+        self,
+        corners_subpixel: List[np.array],
+        guess: Tuple[np.array, np.array] = None,
+    ) -> PoseEstimation:
+        """Solve all eight corners against the whole target in one call."""
+        camera_matrix = self.calibration_info.camera_matrix
+        dist_coeffs = self.calibration_info.dist_coeffs
+        corners = np.concatenate(corners_subpixel[:2]).astype(np.float64)
+        if self.calibration_info.fisheye:
+            corners = cv2.fisheye.undistortPoints(
+                corners, camera_matrix, dist_coeffs, P=camera_matrix
+            )
+            dist_coeffs = None
+
+        rvec, tvec, use_guess, flags = None, None, False, cv2.SOLVEPNP_ITERATIVE
+        if self.pose_solver == "ippe":
+            flags = cv2.SOLVEPNP_IPPE
+        elif self.pose_solver == "warm" and guess is not None:
+            # solvePnP refines the guess in place
+            rvec, tvec = guess[0].copy(), guess[1].copy()
+            use_guess = True
+
+        found, rvec, tvec = cv2.solvePnP(
+            constants.VISION_TARGET_OBJECT_POINTS,
+            corners,
+            camera_matrix,
+            dist_coeffs,
+            rvec,
+            tvec,
+            use_guess,
+            flags,
+        )
+        if not found:
+            return None
+        return PoseEstimation(rvec, tvec, rvec, tvec)
+
+    def reprojection_error(
+        self, result: PoseEstimation, corners_subpixel: List[np.array]
+    ) -> float:
+        """RMS distance in pixels between the corners and the solved model."""
+        calibration = self.calibration_info
+        project = (
+            cv2.fisheye.projectPoints if calibration.fisheye else cv2.projectPoints
+        )
+        if self.pose_mode == "target":
+            object_points = (constants.VISION_TARGET_OBJECT_POINTS,)
+            poses = ((result.left_rvec, result.left_tvec),)
+            corners = (np.concatenate(corners_subpixel[:2]),)
+        else:
+            object_points = (
+                constants.VISION_TAPE_OBJECT_POINTS_LEFT_SIDE,
+                constants.VISION_TAPE_OBJECT_POINTS_RIGHT_SIDE,
+            )
+            poses = (
+                (result.left_rvec, result.left_tvec),
+                (result.right_rvec, result.right_tvec),
+            )
+            corners = corners_subpixel[:2]
+
+        squared = []
+        for objp, (rvec, tvec), image_points in zip(object_points, poses, corners):
+            projected, _ = project(
+                objp.reshape(-1, 1, 3),
+                rvec,
+                tvec,
+                calibration.camera_matrix,
+                calibration.dist_coeffs,
+            )
+            squared.append(
+                np.sum((projected.reshape(-1, 2) - image_points.reshape(-1, 2)) ** 2, 1)
+            )
+        return float(np.sqrt(np.mean(np.concatenate(squared))))
+
     def rodrigues_to_euler_angles(self, rvec):
         mat, jac = cv2.Rodrigues(rvec)
 
@@ -447,13 +1103,15 @@ def save_calibration_results(
     rvecs: np.array,
     tvecs: np.array,
     fisheye: bool,
-    fname: str = "{}/calibration_info.pickle".format(os.path.dirname(__file__)),
+    fname: str = constants.CALIBRATION_FILE_LOCATION,
+    resolution: Tuple[int, int] = None,
 ):
-    results = CalibrationResults(camera_matrix, dist_coeffs, rvecs, tvecs, fisheye)
-    with open(fname, "wb") as f:
-        pickle.dump(results, f)
+    results = CalibrationResults(
+        camera_matrix, dist_coeffs, rvecs, tvecs, fisheye, resolution
+    )
+    save_calibration(fname, results)
 
 
 def load_calibration_results(fname: str) -> CalibrationResults:
-    with open(fname, "rb") as f:
-        return pickle.load(f)
+    """Return the calibration in ``fname``, shared with every other user of it."""
+    return load_calibration(fname)
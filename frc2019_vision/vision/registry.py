@@ -0,0 +1,80 @@
+import threading
+
+from typing import Callable, Dict, Tuple
+
+from . import constants, pipeline
+from .. import Target
+
+
+def _tape_pipeline(calib_fname: str = constants.CALIBRATION_FILE_LOCATION, **options):
+    return pipeline.TapePipeline(calib_fname=calib_fname, **options)
+
+
+DEFAULT_FACTORIES: Dict[Target, Callable] = {
+    Target.TAPE: _tape_pipeline,
+    Target.BALL: pipeline.BallPipeline,
+}
+"""Functions used to build the pipeline for each target"""
+
+
+class PipelineRegistry:
+    """Builds each pipeline once per target and keeps it alive across frames.
+
+    Pipelines are created lazily the first time their target is selected, with
+    the calibration named by their ``calib_fname`` option, and tracking state such as
+    ``TapePipeline.last_centroid_x`` survives from one frame to the next.
+    ``options`` holds the keyword arguments each target's factory is called with.
+    """
+
+    def __init__(
+        self,
+        factories: Dict[Target, Callable] = None,
+        options: Dict[Target, dict] = None,
+    ):
+        self._factories = dict(DEFAULT_FACTORIES if factories is None else factories)
+        self._options = dict(options or {})
+        self._pipelines = {}
+        self._lock = threading.Lock()
+        self._active: Tuple[Target, object] = (Target.NONE, None)
+
+    def supports(self, target: Target) -> bool:
+        return target in self._factories
+
+    def get(self, target: Target):
+        """Return the pipeline for ``target``, building it on first use."""
+        try:
+            return self._pipelines[target]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if target not in self._pipelines:
+                factory = self._factories.get(target)
+                self._pipelines[target] = (
+                    factory(**self._options.get(target, {}))
+                    if factory is not None
+                    else None
+                )
+            return self._pipelines[target]
+
+    def select(self, target: Target) -> Tuple[Target, object]:
+        """Make ``target`` the active target and return ``(target, pipeline)``.
+
+        The pair is swapped in a single assignment, so a caller never sees the
+        pipeline of one target paired with another. Switching to a new target
+        resets the tracking state of the pipeline being switched to.
+        """
+        active_target, active_pipeline = self._active
+        if target == active_target:
+            return active_target, active_pipeline
+
+        new_pipeline = self.get(target)
+        reset = getattr(new_pipeline, "reset", None)
+        if reset is not None:
+            reset()
+        self._active = (target, new_pipeline)
+        return self._active
+
+    @property
+    def active(self) -> Tuple[Target, object]:
+        return self._active
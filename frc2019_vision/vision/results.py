@@ -0,0 +1,95 @@
+"""Latest vision result, shared between the vision thread and its readers."""
+
+import collections
+import threading
+import time
+
+from typing import Optional
+
+
+PoseSnapshot = collections.namedtuple(
+    "PoseSnapshot",
+    [
+        "sequence",
+        "timestamp",
+        "target",
+        "detected",
+        "distance",
+        "angle",
+        "offset",
+        "targets",
+        "track",
+    ],
+)
+"""Everything measured in one frame: its capture sequence number and
+``time.monotonic()`` capture time, the target searched for, whether it was
+found, its distance, angle and offset, every visible target and the tracker's
+``TrackState`` after it"""
+PoseSnapshot.__new__.__defaults__ = (None,)
+
+
+class ResultStore:
+    """Holds the newest ``PoseSnapshot``, replaced whole once per frame.
+
+    Snapshots are immutable and swapped in with a single assignment, so
+    ``latest`` never takes a lock and always returns the values of one frame.
+    Readers that want to block until the next frame use ``wait_for_result``.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._latest: PoseSnapshot = None
+
+    def publish(
+        self,
+        sequence: int,
+        timestamp: float,
+        target,
+        distance,
+        angle,
+        offset,
+        targets: tuple = (),
+        track=None,
+    ) -> PoseSnapshot:
+        """Replace the snapshot with the result of a newer frame."""
+        snapshot = PoseSnapshot(
+            sequence,
+            timestamp,
+            target,
+            distance is not None,
+            distance,
+            angle,
+            offset,
+            tuple(targets),
+            track,
+        )
+        with self._condition:
+            self._latest = snapshot
+            self._condition.notify_all()
+        return snapshot
+
+    def latest(self) -> Optional[PoseSnapshot]:
+        """Return the newest snapshot without waiting, or None if there is none."""
+        return self._latest
+
+    def age(self, snapshot: PoseSnapshot) -> float:
+        """Seconds since the frame of ``snapshot`` was captured."""
+        return self.clock() - snapshot.timestamp
+
+    def wait_for_result(
+        self, after_sequence: int = 0, timeout: float = None
+    ) -> Optional[PoseSnapshot]:
+        """Block until a snapshot newer than ``after_sequence`` is published.
+
+        Returns None if ``timeout`` seconds pass first.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._has_newer(after_sequence), timeout
+            ):
+                return None
+            return self._latest
+
+    def _has_newer(self, sequence: int) -> bool:
+        return self._latest is not None and self._latest.sequence > sequence
@@ -0,0 +1,251 @@
+"""Synthetic 2019 vision target scenes with known ground-truth pose.
+
+Tape pairs are rendered with ``cv2.projectPoints`` from the same object points
+the tape pipeline solves against, so the pose the pipeline should report is
+known exactly for every frame.
+"""
+
+import argparse
+import collections
+import json
+import math
+import os
+
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from . import constants, pipeline
+
+
+TargetPose = collections.namedtuple(
+    "TargetPose", ["rvec", "tvec", "distance", "angle", "offset"]
+)
+"""Pose of one target in camera coordinates (feet), with the values the vision
+thread publishes for it: distance along the optical axis, yaw in degrees and
+lateral offset"""
+
+SyntheticFrame = collections.namedtuple("SyntheticFrame", ["index", "image", "targets"])
+
+TARGET_LEFT_TAPE = constants.VISION_TARGET_OBJECT_POINTS[:4]
+"""Corners of the left tape, with the origin halfway between the top corners"""
+
+TARGET_RIGHT_TAPE = constants.VISION_TARGET_OBJECT_POINTS[4:]
+"""Corners of the right tape, with the origin halfway between the top corners"""
+
+# The object points have y pointing up, camera coordinates have y pointing down
+_UPRIGHT = np.diag([1.0, -1.0, -1.0])
+
+# Order of the object points going around each tape's outline
+_OUTLINE = [0, 1, 3, 2]
+
+TAPE_BGR = (0, 255, 0)
+"""Color of lit retroreflective tape, well inside the pipeline's green range"""
+
+
+def _yaw_matrix(yaw: float) -> np.array:
+    c, s = math.cos(yaw), math.sin(yaw)
+    return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+
+
+class SceneGenerator:
+    """Renders batches of tape targets at random poses.
+
+    All randomness comes from ``seed``, so the same arguments always produce the
+    same frames. Frames are produced one at a time by ``frames()``, so arbitrarily
+    large datasets never have to sit in memory.
+
+    Ranges are ``(low, high)`` tuples: distances and heights in feet, angles in
+    degrees. ``bearing_range`` is the direction of the target seen from the camera
+    and ``yaw_range`` is the rotation of the target itself.
+    """
+
+    def __init__(
+        self,
+        calibration: pipeline.CalibrationResults,
+        width: int = 640,
+        height: int = 480,
+        distance_range: Tuple[float, float] = (1.5, 12.0),
+        bearing_range: Tuple[float, float] = (-15.0, 15.0),
+        yaw_range: Tuple[float, float] = (-30.0, 30.0),
+        height_range: Tuple[float, float] = (-0.5, 0.5),
+        targets_range: Tuple[int, int] = (1, 1),
+        target_spacing_range: Tuple[float, float] = (2.0, 3.0),
+        distractors_range: Tuple[int, int] = (0, 0),
+        noise: float = 0.0,
+        motion_blur: int = 0,
+        seed: int = 0,
+    ):
+        self.calibration = calibration
+        self.width = width
+        self.height = height
+        self.distance_range = distance_range
+        self.bearing_range = bearing_range
+        self.yaw_range = yaw_range
+        self.height_range = height_range
+        self.targets_range = targets_range
+        self.target_spacing_range = target_spacing_range
+        self.distractors_range = distractors_range
+        self.noise = noise
+        self.motion_blur = motion_blur
+        self.seed = seed
+
+    def frames(self, count: int = None) -> Iterator[SyntheticFrame]:
+        """Yield ``count`` frames, or frames forever if ``count`` is None."""
+        rng = np.random.RandomState(self.seed)
+        index = 0
+        while count is None or index < count:
+            yield self.random_frame(rng, index)
+            index += 1
+
+    def random_frame(self, rng: np.random.RandomState, index: int = 0):
+        # only targets that are fully in view count as ground truth
+        targets = [t for t in self.random_targets(rng) if self.in_view(t)]
+        image = self.background(rng)
+        self.draw_distractors(image, rng)
+        for target in targets:
+            self.draw_target(image, target, brightness=rng.uniform(0.7, 1.0))
+        image = self.degrade(image, rng)
+        return SyntheticFrame(index, image, targets)
+
+    def random_targets(self, rng: np.random.RandomState) -> List[TargetPose]:
+        distance = rng.uniform(*self.distance_range)
+        bearing = math.radians(rng.uniform(*self.bearing_range))
+        yaw = rng.uniform(*self.yaw_range)
+        center = np.array(
+            [distance * math.tan(bearing), rng.uniform(*self.height_range), distance]
+        )
+
+        # Extra targets sit next to the first one on the same wall, like the
+        # targets on the cargo ship
+        num_targets = rng.randint(self.targets_range[0], self.targets_range[1] + 1)
+        first = rng.randint(0, num_targets)
+        spacing = rng.uniform(*self.target_spacing_range)
+        rotation = np.matmul(_yaw_matrix(math.radians(yaw)), _UPRIGHT)
+        return [
+            self.target_pose(
+                center + np.matmul(rotation, [(i - first) * spacing, 0, 0]), yaw
+            )
+            for i in range(num_targets)
+        ]
+
+    @staticmethod
+    def target_pose(center: np.array, yaw: float) -> TargetPose:
+        """Pose of a target whose origin is at ``center``, turned by ``yaw`` deg."""
+        rotation = np.matmul(_yaw_matrix(math.radians(yaw)), _UPRIGHT)
+        rvec, _ = cv2.Rodrigues(rotation)
+        tvec = np.array(center, dtype=np.float64).reshape(3, 1)
+        return TargetPose(rvec, tvec, tvec[2][0], yaw, tvec[0][0])
+
+    def project(self, object_points: np.array, target: TargetPose) -> np.array:
+        object_points = object_points.reshape(-1, 1, 3).astype(np.float64)
+        if self.calibration.fisheye:
+            image_points, _ = cv2.fisheye.projectPoints(
+                object_points,
+                target.rvec,
+                target.tvec,
+                self.calibration.camera_matrix,
+                self.calibration.dist_coeffs,
+            )
+        else:
+            image_points, _ = cv2.projectPoints(
+                object_points,
+                target.rvec,
+                target.tvec,
+                self.calibration.camera_matrix,
+                self.calibration.dist_coeffs,
+            )
+        return image_points.reshape(-1, 2)
+
+    def in_view(self, target: TargetPose) -> bool:
+        """Whether every corner of the target lands inside the frame.
+
+        Uses a pinhole projection: the distortion polynomial is meaningless far
+        outside the field of view and can fold points back into the image.
+        """
+        object_points = np.concatenate((TARGET_LEFT_TAPE, TARGET_RIGHT_TAPE))
+        camera_points = (
+            np.matmul(cv2.Rodrigues(target.rvec)[0], object_points.T) + target.tvec
+        )
+        if np.any(camera_points[2] <= 0):
+            return False
+        image_points = np.matmul(self.calibration.camera_matrix, camera_points)
+        x, y = image_points[:2] / image_points[2]
+        return bool(np.all((x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)))
+
+    def background(self, rng: np.random.RandomState) -> np.array:
+        level = rng.randint(10, 60)
+        return np.full((self.height, self.width, 3), level, dtype=np.uint8)
+
+    def draw_target(self, image: np.array, target: TargetPose, brightness=1.0):
+        color = tuple(int(c * brightness) for c in TAPE_BGR)
+        for tape in (TARGET_LEFT_TAPE, TARGET_RIGHT_TAPE):
+            corners = self.project(tape[_OUTLINE], target)
+            # 4 bits of sub-pixel precision keeps the edges from snapping to
+            # whole pixels
+            cv2.fillConvexPoly(
+                image, np.round(corners * 16).astype(np.int32), color, cv2.LINE_AA, 4
+            )
+
+    def draw_distractors(self, image: np.array, rng: np.random.RandomState):
+        """Draw green blobs that the pipeline should reject."""
+        count = rng.randint(self.distractors_range[0], self.distractors_range[1] + 1)
+        for _ in range(count):
+            center = (rng.randint(0, self.width), rng.randint(0, self.height))
+            axes = (rng.randint(3, 40), rng.randint(3, 40))
+            color = (0, rng.randint(150, 256), 0)
+            cv2.ellipse(image, center, axes, rng.uniform(0, 180), 0, 360, color, -1)
+
+    def degrade(self, image: np.array, rng: np.random.RandomState) -> np.array:
+        if self.motion_blur > 1:
+            kernel = np.zeros((self.motion_blur, self.motion_blur), dtype=np.float32)
+            kernel[self.motion_blur // 2, :] = 1.0 / self.motion_blur
+            center = (self.motion_blur / 2 - 0.5, self.motion_blur / 2 - 0.5)
+            rotation = cv2.getRotationMatrix2D(center, rng.uniform(0, 180), 1.0)
+            kernel = cv2.warpAffine(
+                kernel, rotation, (self.motion_blur, self.motion_blur)
+            )
+            kernel /= max(kernel.sum(), 1e-6)
+            image = cv2.filter2D(image, -1, kernel)
+        if self.noise > 0:
+            noise = rng.normal(0, self.noise, image.shape)
+            image = np.clip(image + noise, 0, 255).astype(np.uint8)
+        return image
+
+
+def main(argv: List[str] = None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("output", help="directory to write the frames to")
+    ap.add_argument("-n", "--count", type=int, default=100, help="number of frames")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--noise", type=float, default=0.0, help="noise std deviation")
+    ap.add_argument("--motion-blur", type=int, default=0, help="blur length (px)")
+    ap.add_argument("--distractors", type=int, default=0, help="max distractors")
+    ap.add_argument("--targets", type=int, default=1, help="max targets per frame")
+    args = ap.parse_args(argv)
+
+    generator = SceneGenerator(
+        pipeline.load_calibration_results(constants.CALIBRATION_FILE_LOCATION),
+        targets_range=(1, args.targets),
+        distractors_range=(0, args.distractors),
+        noise=args.noise,
+        motion_blur=args.motion_blur,
+        seed=args.seed,
+    )
+
+    os.makedirs(args.output, exist_ok=True)
+    # ground truth goes next to the images, one JSON object per line
+    with open(os.path.join(args.output, "truth.jsonl"), "w") as truth:
+        for frame in generator.frames(args.count):
+            name = "{:06d}.png".format(frame.index)
+            cv2.imwrite(os.path.join(args.output, name), frame.image)
+            targets = [
+                {"distance": t.distance, "angle": t.angle, "offset": t.offset}
+                for t in frame.targets
+            ]
+            truth.write(json.dumps({"image": name, "targets": targets}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""BGR to mask thresholding with a precomputed lookup table.
+
+Converting every pixel to HSV and comparing it against a range gives the same
+answer for the same color every frame, so the answer for all 2^24 BGR colors is
+computed once and stored in a table. Each entry holds one bit per HSV range, so
+one table serves every range (tape and ball) and a mask is a single lookup.
+Tables are cached on disk, keyed by their ranges, since building one takes most
+of a second.
+"""
+
+import hashlib
+import os
+import threading
+
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .workspace import Workspace
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "frc2019_vision")
+
+TABLE_VERSION = 1
+"""Bump when the table layout changes so stale cache files are ignored"""
+
+MAX_RANGES = 8
+"""One bit of the uint8 table entry per range"""
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _table_key(ranges: Sequence[Tuple[np.array, np.array]]) -> str:
+    digest = hashlib.sha1(str(TABLE_VERSION).encode("ascii"))
+    for lower, upper in ranges:
+        digest.update(np.asarray(lower, dtype=np.uint8).tobytes())
+        digest.update(np.asarray(upper, dtype=np.uint8).tobytes())
+    return digest.hexdigest()
+
+
+def build_table(ranges: Sequence[Tuple[np.array, np.array]]) -> np.array:
+    """Bit ``i`` of entry ``b | g << 8 | r << 16`` is set if that BGR color falls
+    in ``ranges[i]`` once converted to HSV."""
+    colors = np.arange(1 << 24, dtype=np.uint32)
+    bgr = np.empty((1 << 24, 1, 3), dtype=np.uint8)
+    bgr[:, 0, 0] = colors & 0xFF
+    bgr[:, 0, 1] = (colors >> 8) & 0xFF
+    bgr[:, 0, 2] = colors >> 16
+    del colors
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    del bgr
+
+    table = np.zeros(1 << 24, dtype=np.uint8)
+    for i, (lower, upper) in enumerate(ranges):
+        in_range = cv2.inRange(hsv, np.asarray(lower), np.asarray(upper)).ravel()
+        table |= in_range & np.uint8(1 << i)
+    return table
+
+
+def load_table(
+    ranges: Sequence[Tuple[np.array, np.array]], cache_dir: str = CACHE_DIR
+) -> np.array:
+    """Return the table for ``ranges``, from memory, the disk cache or built.
+
+    Tables are shared by everything in the process that uses the same ranges. If
+    the cache can't be written the table is still returned, just not saved.
+    """
+    key = _table_key(ranges)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is not None:
+            return table
+
+        fname = None
+        if cache_dir is not None:
+            fname = os.path.join(cache_dir, "threshold-{}.npy".format(key))
+            try:
+                table = np.load(fname)
+            except (OSError, ValueError):
+                table = None
+        if table is None or table.shape != (1 << 24,):
+            table = build_table(ranges)
+            if fname is not None:
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    # write to a temporary file first, worker processes may be
+                    # loading the same table
+                    tmp = "{}.{}.tmp".format(fname, os.getpid())
+                    with open(tmp, "wb") as f:
+                        np.save(f, table)
+                    os.replace(tmp, fname)
+                except OSError:
+                    pass
+
+        _tables[key] = table
+        return table
+
+
+class ThresholdTable:
+    """Segments BGR images against up to 8 HSV ranges with one table lookup.
+
+    ``mask(image, i)`` is identical to
+    ``cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), *ranges[i])``. Scratch
+    buffers are kept between calls, so an instance must not be shared between
+    threads; the table itself is shared.
+    """
+
+    def __init__(
+        self, ranges: Sequence[Tuple[np.array, np.array]], cache_dir: str = CACHE_DIR
+    ):
+        if not 0 < len(ranges) <= MAX_RANGES:
+            raise ValueError("between 1 and {} ranges are needed".format(MAX_RANGES))
+        self.ranges = list(ranges)
+        self.table = load_table(self.ranges, cache_dir)
+        self.workspace = Workspace()
+
+    def lookup(self, image: np.array) -> np.array:
+        """Return the table entry of every pixel of a BGR image."""
+        shape = image.shape[:2]
+        packed = self.workspace.get("packed", shape + (4,))
+        codes = self.workspace.get("codes", shape)
+
+        # BGRA pixels read as little-endian uint32 are b | g << 8 | r << 16 | a << 24
+        cv2.cvtColor(image, cv2.COLOR_BGR2BGRA, dst=packed)
+        index = packed.view(np.uint32)[..., 0]
+        np.bitwise_and(index, 0xFFFFFF, out=index)
+        np.take(self.table, index, out=codes, mode="clip")
+        return codes
+
+    def mask(self, image: np.array, index: int = 0, dst: np.array = None) -> np.array:
+        """Return the 0/255 mask of ``ranges[index]``, in ``dst`` if given."""
+        return self.mask_from_codes(self.lookup(image), index, dst)
+
+    @staticmethod
+    def mask_from_codes(codes: np.array, index: int, dst: np.array = None):
+        dst = cv2.bitwise_and(codes, 1 << index, dst=dst)
+        return cv2.compare(dst, 0, cv2.CMP_NE, dst=dst)
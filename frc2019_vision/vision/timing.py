@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+
+from typing import Dict
+
+import numpy as np
+
+
+class _Stage:
+    __slots__ = ("_timings", "_name", "_start")
+
+    def __init__(self, timings, name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timings.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class StageTimings:
+    """Records how long each pipeline stage takes, per frame.
+
+    Every stage keeps its last ``size`` durations in a fixed-size ring buffer, so
+    memory use stays flat no matter how long the robot runs. When ``enabled`` is
+    False, ``stage()`` returns a shared do-nothing context manager and nothing is
+    recorded.
+    """
+
+    def __init__(self, size: int = 512, enabled: bool = False):
+        self.size = size
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._samples: Dict[str, np.array] = {}
+        self._counts: Dict[str, int] = {}
+        self._frame: Dict[str, float] = {}
+
+    def stage(self, name: str):
+        """Context manager timing the code inside it as stage ``name``."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = np.zeros(self.size)
+                self._counts[name] = 0
+            samples[self._counts[name] % self.size] = seconds
+            self._counts[name] += 1
+            self._frame[name] = self._frame.get(name, 0) + seconds
+
+    def record_frame(self, durations: Dict[str, float]):
+        """Record the stage durations of a frame timed somewhere else."""
+        for name, seconds in durations.items():
+            self.record(name, seconds)
+
+    def take_frame(self) -> Dict[str, float]:
+        """Return and forget the durations recorded since the last call."""
+        with self._lock:
+            frame, self._frame = self._frame, {}
+        return frame
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._frame = {}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Rolling p50/p95/p99/max of every stage, in milliseconds."""
+        with self._lock:
+            samples = {
+                name: values[: min(self._counts[name], self.size)].copy()
+                for name, values in self._samples.items()
+            }
+            counts = dict(self._counts)
+
+        summary = {}
+        for name, values in samples.items():
+            p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000
+            summary[name] = {
+                "count": counts[name],
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(values.max() * 1000),
+            }
+        return summary
+
+    def dump(self, fname: str):
+        with open(fname, "w") as f:
+            json.dump(self.summary(), f, indent=2, sort_keys=True)
+
+
+TIMINGS = StageTimings()
+"""Timings shared by every pipeline in this process"""
@@ -0,0 +1,135 @@
+"""Smoothing and prediction of the published pose between vision frames."""
+
+import collections
+import threading
+import time
+
+from typing import Optional
+
+import numpy as np
+
+
+TrackedPose = collections.namedtuple(
+    "TrackedPose", ["distance", "angle", "offset", "age"]
+)
+"""Pose predicted for a moment in time and how long before it (seconds) the
+last measurement it is based on was captured"""
+
+TrackState = collections.namedtuple("TrackState", ["timestamp", "position", "velocity"])
+"""Filtered distance, angle and offset and their velocity as of the newest
+measurement, captured at ``timestamp``"""
+
+
+class PoseTracker:
+    """Constant velocity alpha-beta filter over distance, angle and offset.
+
+    Every pipeline result is fed to ``update`` with its capture time, and
+    ``predict`` extrapolates the filtered pose to any later moment, so the pose
+    can be read far more often than frames arrive. Frames without a detection
+    don't disturb the estimate; once nothing has been measured for
+    ``coast_time`` seconds the target is reported lost. A measurement after the
+    target was lost, or for a different target, starts over from it with zero
+    velocity.
+
+    ``update`` returns the filter's ``TrackState`` after each frame, which can
+    be published with that frame's result and predicted from later, so readers
+    of the result and of the pose see the same frame.
+
+    ``alpha`` and ``beta`` are the position and velocity gains: higher values
+    follow measurements more closely, lower values smooth out more noise.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.4,
+        beta: float = 0.1,
+        coast_time: float = 0.5,
+        clock=time.monotonic,
+    ):
+        self.alpha = alpha
+        self.beta = beta
+        self.coast_time = coast_time
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._target = None
+            self._timestamp = None
+            self._position = None
+            self._velocity = None
+
+    @property
+    def target(self):
+        """Target of the current estimate."""
+        return self._target
+
+    def update(
+        self, timestamp: float, distance, angle, offset, target=None
+    ) -> Optional[TrackState]:
+        """Feed the result of the frame captured at ``timestamp`` and return the
+        state after it, None while there is no estimate.
+
+        ``distance`` is None for a frame the target wasn't found in. Results
+        older than the newest one fed so far are ignored.
+        """
+        with self._lock:
+            if target != self._target:
+                self._target = target
+                self._timestamp = None
+            if distance is None:
+                return self._state()
+            if self._timestamp is not None and timestamp <= self._timestamp:
+                return self._state()
+
+            # the ball has no offset, carry it along as NaN
+            measured = np.array(
+                [
+                    np.nan if value is None else value
+                    for value in (distance, angle, offset)
+                ]
+            )
+            if self._timestamp is None or timestamp - self._timestamp > self.coast_time:
+                self._position = measured
+                self._velocity = np.zeros(3)
+            else:
+                dt = timestamp - self._timestamp
+                predicted = self._position + self._velocity * dt
+                residual = measured - predicted
+                self._position = predicted + self.alpha * residual
+                self._velocity = self._velocity + (self.beta / dt) * residual
+            self._timestamp = timestamp
+            return self._state()
+
+    def _state(self) -> Optional[TrackState]:
+        # position and velocity are replaced, never changed in place, so the
+        # state can share them
+        if self._timestamp is None:
+            return None
+        return TrackState(self._timestamp, self._position, self._velocity)
+
+    def predict(
+        self, now: float = None, state: TrackState = None
+    ) -> Optional[TrackedPose]:
+        """Return the pose extrapolated to ``now`` (the clock by default), or
+        None if the target is lost.
+
+        The prediction is made from ``state`` if given, else from the newest
+        measurement fed.
+        """
+        if now is None:
+            now = self.clock()
+        if state is None:
+            with self._lock:
+                state = self._state()
+            if state is None:
+                return None
+        age = now - state.timestamp
+        if age > self.coast_time:
+            return None
+        predicted = state.position + state.velocity * max(age, 0)
+        distance, angle, offset = (
+            None if np.isnan(value) else float(value) for value in predicted
+        )
+        return TrackedPose(distance, angle, offset, age)
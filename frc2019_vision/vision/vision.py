@@ -1,16 +1,55 @@
 import cv2
-import imutils
-import math
 
-from . import constants, gui, pipeline
+from . import constants, gui
+from .registry import PipelineRegistry
+from .workers import ResultPublisher, VisionResult, WorkerPool, configure
 from .. import StoppableThread, Target, environment
 
 
-def update_enviornment(distance, angle, offset):
-    # Update values in the enviorment
-    environment.DISTANCE_FROM_OBJECT.put(distance)
-    environment.ANGLE_FROM_CENTER.put(angle)
-    environment.LATERAL_OFFSET.put(offset)
+def update_enviornment(result: VisionResult):
+    # Update values in the enviorment, the tracker state goes out with the
+    # result so the pose and the measurement read together are of one frame
+    track = environment.TRACKER.update(
+        result.timestamp, result.distance, result.angle, result.offset, result.target
+    )
+    environment.RESULTS.publish(
+        result.sequence,
+        result.timestamp,
+        result.target,
+        result.distance,
+        result.angle,
+        result.offset,
+        result.targets,
+        track,
+    )
+
+
+def predict(target: Target, timestamp: float):
+    """The tracker's pose of ``target`` at ``timestamp``, if it is tracking it."""
+    if environment.TRACKER.target != target:
+        return None
+    return environment.TRACKER.predict(timestamp)
+
+
+def pipeline_options():
+    """Keyword arguments for each target's pipeline, from the command line."""
+    return {
+        Target.TAPE: {
+            "calib_fname": environment.CALIBRATION[0],
+            "scale": environment.PYRAMID_SCALE,
+            "lut": environment.LUT,
+            "track_roi": environment.ROI,
+            "max_misses": environment.ROI_MISSES,
+            "pose_mode": environment.POSE_MODE,
+            "pose_solver": environment.POSE_SOLVER,
+            "max_reprojection_error": environment.MAX_REPROJECTION_ERROR,
+        },
+        Target.BALL: {
+            "calib_fname": environment.CALIBRATION[0],
+            "scale": environment.PYRAMID_SCALE,
+            "lut": environment.LUT,
+        },
+    }
 
 
 def create_windows():
@@ -21,71 +60,91 @@ def create_windows():
 class VisionThread(StoppableThread):
     def __init__(self):
         StoppableThread.__init__(self)
+        options = pipeline_options()
+        self.pipelines = PipelineRegistry(options=options)
+        self.publisher = ResultPublisher(update_enviornment)
+        self.workers = None
+        if environment.VISION_WORKERS > 0:
+            self.workers = WorkerPool(
+                environment.VISION_WORKERS,
+                environment.CAPTURE.frames,
+                self.finish_frame,
+                options,
+            )
 
     def run(self):
         try:
             if environment.GUI:
                 create_windows()
 
+            if self.workers is not None:
+                self.workers.start()
+
+            sequence = 0
             while not self.stopped():
-                if self.stopped():
+                # with worker processes, only take a frame once one of them is
+                # free so the frame it gets is as fresh as possible
+                if self.workers is not None and not self.workers.reserve(timeout=0.5):
                     continue
-                # grab the current frame
-                ret, frame = environment.VIDEO_STREAM.read()
 
-                # if we are viewing a video and we did not grab a frame,
-                # then we have reached the end of the video
-                if not ret:
+                # wait for a frame newer than the last one we processed, the
+                # capture thread drops any that arrived while we were busy
+                captured = environment.CAPTURE.wait_for_frame(sequence, timeout=0.5)
+                if captured is None:
+                    if self.workers is not None:
+                        self.workers.cancel()
                     continue
+                frame, sequence = captured.image, captured.sequence
 
                 # frame = cv2.rotate(frame, rotateCode=cv2.ROTATE_90_COUNTERCLOCKWISE)
 
-                # Put current frame (with crosshairs) in queue for Driverstation stream
-                stream_frame = frame.copy()
-                # stream_frame = imutils.resize(stream_frame, width=constants.SCREEN_WIDTH, height=constants.SCREEN_HEIGHT)
-                # gui.draw_crosshairs(stream_frame)
-                environment.DRIVERSTATION_FRAMES.put(stream_frame)
-
+                # The driverstation stream reads the same shared frame straight
+                # from the capture thread, so the frame must not be drawn on here
                 target: Target = environment.TARGET.get()
-
-                if target == Target.TAPE:
-                    tape_pipeline = pipeline.TapePipeline(
-                        calib_fname=constants.CALIBRATION_FILE_LOCATION
-                    )
-                    pipeline_result = tape_pipeline.process_image(frame)
-                    pose_estimation = None
-                    try:
-                        pose_estimation = pipeline_result.pose_estimation
-                    except AttributeError:
-                        pose_estimation = None
-                    tvecs = None
-                    rvecs = None
-                    euler_angles = None
-                    if pose_estimation is not None:
-                        tvecs = (
-                            pose_estimation.left_tvec + pose_estimation.right_tvec
-                        ) / 2
-                        rvecs = pose_estimation.left_rvec
-                        euler_angles = (
-                            pipeline_result.euler_angles.left
-                            + pipeline_result.euler_angles.right
-                        ) / 2
-
-                        # tvecs[2][0] for distance from plane to plane
-                        # tvecs[0][0] for lateral distance
-                        # np.linalg.norm(tvecs) for euclidean distance
-                        # euler angle contains [x,y,z] (radians)
-
-                        update_enviornment(
-                            tvecs[2][0], math.degrees(euler_angles[1]), tvecs[0][0]
+                prediction = predict(target, captured.timestamp)
+
+                if self.workers is not None:
+                    if environment.GUI:
+                        frame = frame.copy()
+                    if self.pipelines.supports(target):
+                        # the pool releases the frame once the worker is done
+                        self.workers.submit(
+                            captured,
+                            target,
+                            self.publisher.tracking.get(target),
+                            prediction,
                         )
                     else:
-                        update_enviornment(None, None, None)
-
-                elif target == Target.BALL:
-                    ball_pipeline = pipeline.BallPipeline()
-                    frame, dist, angle = ball_pipeline.ball_val(frame)
-                    update_enviornment(dist, angle, None)
+                        self.workers.cancel()
+                        environment.CAPTURE.release(captured)
+                else:
+                    target, active_pipeline = self.pipelines.select(target)
+                    if active_pipeline is not None:
+                        configure(
+                            active_pipeline,
+                            environment.CORNER_METHOD,
+                            environment.CALIBRATION,
+                            prediction,
+                        )
+                        frame, distance, angle, offset = active_pipeline.measure(
+                            frame, annotate=environment.GUI
+                        )
+                        self.finish_frame(
+                            captured.slot,
+                            VisionResult(
+                                sequence,
+                                captured.timestamp,
+                                target,
+                                distance,
+                                angle,
+                                offset,
+                                None,
+                                tuple(getattr(active_pipeline, "visible_targets", ())),
+                            ),
+                        )
+                    if environment.GUI and frame is captured.image:
+                        frame = frame.copy()
+                    environment.CAPTURE.release(captured)
 
                 if environment.GUI:
                     gui.draw_crosshairs(frame)
@@ -97,11 +156,18 @@ class VisionThread(StoppableThread):
         except KeyboardInterrupt:
             self.stop()
 
-    def stop():
+    def finish_frame(self, slot: int, result: VisionResult):
+        """Publish the result of the frame in ``slot`` and record both."""
+        self.publisher.publish(result)
+        if environment.RECORDER is not None:
+            environment.RECORDER.submit(environment.CAPTURE.frames, slot, result)
+
+    def stop(self):
         # When we break out of the while loop aka time to stop
         # we perform appropriate actions.
-        # stop the camera video stream
-        environment.VIDEO_STREAM.release()
+        # The camera itself is released by the capture thread
+        if self.workers is not None:
+            self.workers.stop()
 
         if environment.GUI:
             # close all windows
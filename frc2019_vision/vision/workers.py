@@ -0,0 +1,244 @@
+import collections
+import logging
+import multiprocessing
+import threading
+
+from typing import Tuple
+
+from .registry import PipelineRegistry
+from .timing import TIMINGS
+from .tracker import TrackedPose
+from .. import Target, environment, logs
+from ..capture import Frame
+from ..shared_frames import FrameRing
+
+
+VisionResult = collections.namedtuple(
+    "VisionResult",
+    [
+        "sequence",
+        "timestamp",
+        "target",
+        "distance",
+        "angle",
+        "offset",
+        "tracking",
+        "targets",
+        "error",
+    ],
+)
+"""Output of a pipeline for one captured frame, ``targets`` holds every visible
+target as a ``TargetPosition``, best first. ``error`` describes the exception
+the pipeline raised instead, if it failed"""
+VisionResult.__new__.__defaults__ = ((), None)
+
+logger = logging.getLogger(__name__)
+
+Task = collections.namedtuple(
+    "Task",
+    [
+        "sequence",
+        "timestamp",
+        "target",
+        "slot",
+        "tracking",
+        "timings",
+        "corners",
+        "calibration",
+        "prediction",
+    ],
+)
+
+
+def configure(
+    pipeline,
+    corner_method: str,
+    calibration: Tuple[str, int],
+    prediction: TrackedPose = None,
+):
+    """Apply the settings that can change while running to ``pipeline``.
+
+    ``calibration`` is the ``(path, generation)`` of the calibration to use, it
+    is only loaded if it differs from the pipeline's. If it can't be loaded the
+    pipeline keeps its current one. ``prediction`` is the tracker's pose of the
+    target at the frame's capture time, for pipelines that follow it.
+    """
+    if hasattr(pipeline, "corner_method"):
+        pipeline.corner_method = corner_method
+    if hasattr(pipeline, "prediction"):
+        pipeline.prediction = prediction
+    if getattr(pipeline, "calibration", calibration) != calibration:
+        try:
+            pipeline.set_calibration(*calibration)
+        except (OSError, ValueError):
+            pass
+
+
+def _worker_main(frames, tasks, results, options, log_level):
+    # spawned processes start without the parent's logging setup
+    logs.configure(logging.getLevelName(log_level))
+    pipelines = PipelineRegistry(options=options)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        target, active_pipeline = pipelines.select(task.target)
+        TIMINGS.enabled = task.timings
+        TIMINGS.take_frame()
+        distance, angle, offset, tracking = None, None, None, task.tracking
+        targets = ()
+        error = None
+        if active_pipeline is not None:
+            # Frames are spread over all workers, so each worker only sees every
+            # Nth frame. Start from the state of the newest published result
+            # instead of this worker's own, older history.
+            active_pipeline.restore_tracking_state(task.tracking)
+            configure(active_pipeline, task.corners, task.calibration, task.prediction)
+            try:
+                _, distance, angle, offset = active_pipeline.measure(
+                    frames.view(task.slot)
+                )
+                tracking = active_pipeline.tracking_state()
+                targets = tuple(getattr(active_pipeline, "visible_targets", ()))
+            except Exception as e:
+                # the frame counts as not found, the next one may well work
+                logger.exception(
+                    "%s pipeline failed on frame %d", target, task.sequence
+                )
+                error = "{}: {}".format(type(e).__name__, e)
+
+        results.put(
+            (
+                task.slot,
+                TIMINGS.take_frame(),
+                VisionResult(
+                    task.sequence,
+                    task.timestamp,
+                    target,
+                    distance,
+                    angle,
+                    offset,
+                    tracking,
+                    targets,
+                    error,
+                ),
+            )
+        )
+
+
+class WorkerPool:
+    """Runs the vision pipelines in ``num_workers`` separate processes.
+
+    At most one frame is in flight per worker, so frames never queue up behind a
+    busy pool. Workers read frames straight out of the shared ``frames`` ring;
+    only the slot number crosses the process boundary. Finished results are
+    handed to ``on_result(slot, result)`` from a collector thread in completion
+    order, which is not necessarily capture order. The slot is released right
+    after ``on_result`` returns. ``options`` is passed on to each worker's
+    ``PipelineRegistry``. Workers log at the level of the root logger when the
+    pool is created; results of frames a pipeline failed on are counted in
+    ``failed``.
+    """
+
+    def __init__(
+        self, num_workers: int, frames: FrameRing, on_result, options: dict = None
+    ):
+        context = multiprocessing.get_context("spawn")
+        self.num_workers = num_workers
+        self._frames = frames
+        self._on_result = on_result
+        self._slots = threading.BoundedSemaphore(num_workers)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self.failed = 0
+        log_level = logging.getLogger().getEffectiveLevel()
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(frames, self._tasks, self._results, options, log_level),
+                daemon=True,
+            )
+            for _ in range(num_workers)
+        ]
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+        self._collector.start()
+
+    def reserve(self, timeout: float = None) -> bool:
+        """Wait until a worker is free and reserve it for the next submit()."""
+        return self._slots.acquire(timeout=timeout)
+
+    def cancel(self):
+        """Give back a reservation that was not used."""
+        self._slots.release()
+
+    def submit(
+        self, frame: Frame, target: Target, tracking, prediction: TrackedPose = None
+    ):
+        """Queue a pinned frame, its slot is released once the result is back."""
+        self._tasks.put(
+            Task(
+                frame.sequence,
+                frame.timestamp,
+                target,
+                frame.slot,
+                tracking,
+                TIMINGS.enabled,
+                environment.CORNER_METHOD,
+                environment.CALIBRATION,
+                prediction,
+            )
+        )
+
+    def stop(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+
+    def _collect(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            slot, durations, result = item
+            # stage timings are recorded in the worker, merge them in here
+            TIMINGS.record_frame(durations)
+            if result.error is not None:
+                self.failed += 1
+            self._slots.release()
+            try:
+                self._on_result(slot, result)
+            finally:
+                self._frames.release(slot)
+
+
+class ResultPublisher:
+    """Publishes vision results, only ever moving forward in capture order.
+
+    Results older than the last published one are counted in ``discarded`` and
+    dropped, so a slow worker can never overwrite a newer position.
+    """
+
+    def __init__(self, publish):
+        self._publish = publish
+        self.sequence = 0
+        self.discarded = 0
+        self.tracking = {}
+
+    def publish(self, result: VisionResult) -> bool:
+        if result.sequence <= self.sequence:
+            self.discarded += 1
+            return False
+
+        self.sequence = result.sequence
+        self.tracking[result.target] = result.tracking
+        self._publish(result)
+        return True
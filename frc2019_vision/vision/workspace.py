@@ -0,0 +1,45 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class Workspace:
+    """Named scratch arrays reused from one frame to the next.
+
+    ``get`` returns a view of the top left corner of a buffer that only ever
+    grows, so regions of interest and downscaled images of varying size don't
+    cause reallocations once the largest size has been seen. ``allocations``
+    counts how many times a buffer had to be (re)allocated.
+
+    Arrays returned by ``get`` are overwritten the next time the same name is
+    requested, so anything kept across frames must be copied.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, np.array] = {}
+        self.allocations = 0
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.array:
+        shape = tuple(int(n) for n in shape)
+        view = tuple(slice(0, n) for n in shape)
+        buffer = self._buffers.get(name)
+        if buffer is not None and (buffer.dtype != dtype or buffer.ndim != len(shape)):
+            buffer = None
+        if buffer is None or any(have < n for have, n in zip(buffer.shape, shape)):
+            if buffer is not None:
+                # grow to fit both, so alternating sizes settle on one buffer
+                shape = tuple(map(max, buffer.shape, shape))
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buffer[view]
+
+    def like(self, name: str, image: np.array) -> np.array:
+        """Scratch array with the shape and dtype of ``image``."""
+        return self.get(name, image.shape, image.dtype)
+
+    def clear(self):
+        self._buffers.clear()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
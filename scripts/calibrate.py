@@ -86,7 +86,13 @@ else:
         objpoints, imgpoints, gray.shape[::-1], None, None
     )
 pipeline.save_calibration_results(
-    mtx, dist, rvecs, tvecs, args.fisheye, constants.CALIBRATION_FILE_LOCATION
+    mtx,
+    dist,
+    rvecs,
+    tvecs,
+    args.fisheye,
+    constants.CALIBRATION_FILE_LOCATION,
+    gray.shape[::-1],
 )
 
 cv2.destroyAllWindows()
@@ -32,6 +32,7 @@ setup(
     entry_points={
         'console_scripts': [
             'vision-2019 = frc2019_vision.__main__:main',
+            'vision-2019-benchmark = frc2019_vision.benchmark:main',
         ]
     },
     package_data={
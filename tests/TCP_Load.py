@@ -0,0 +1,55 @@
+"""A TCP client made to load test the RIO command server
+
+Sends DEPTH pipelined commands at a time, waits for all their replies and
+repeats for SECONDS, then prints the sustained request rate and the round trip
+time of each batch."""
+
+import argparse
+import socket
+import time
+
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--host", default="192.168.1.7")
+ap.add_argument("--port", type=int, default=5005)
+ap.add_argument("--command", default="GET position")
+ap.add_argument("--depth", type=int, default=16, help="commands per batch")
+ap.add_argument("--seconds", type=float, default=5)
+args = ap.parse_args()
+
+batch = bytes((args.command + "\n") * args.depth, "utf-8")
+
+# Create a socket (SOCK_STREAM means a TCP socket)
+with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect((args.host, args.port))
+
+    requests = 0
+    errors = 0
+    round_trips = []
+    pending = b""
+    start = time.monotonic()
+    while time.monotonic() - start < args.seconds:
+        sent = time.monotonic()
+        sock.sendall(batch)
+        replies = []
+        while len(replies) < args.depth:
+            data = sock.recv(65536)
+            if not data:
+                raise ConnectionError("server closed the connection")
+            *lines, pending = (pending + data).split(b"\n")
+            replies.extend(lines)
+        round_trips.append(time.monotonic() - sent)
+        requests += len(replies)
+        errors += sum(reply.startswith(b"-ERR") for reply in replies)
+    elapsed = time.monotonic() - start
+
+round_trips.sort()
+print("Requests: {} ({} errors) in {:.1f} s".format(requests, errors, elapsed))
+print("Rate:     {:.0f} requests/s".format(requests / elapsed))
+print(
+    "Batch:    p50 {:.3f} ms, p99 {:.3f} ms".format(
+        round_trips[len(round_trips) // 2] * 1e3,
+        round_trips[int(len(round_trips) * 0.99)] * 1e3,
+    )
+)
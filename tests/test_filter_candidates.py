@@ -0,0 +1,201 @@
+"""The vectorized tape candidate filter has to keep and reject exactly the
+contours the per-contour loop it replaced did."""
+
+import cv2
+import imutils
+import numpy as np
+import pytest
+
+from frc2019_vision.vision import constants, pipeline
+
+
+WIDTH = 320
+HEIGHT = 240
+
+
+def reference_filter(bitmask, offset=(0, 0), scale=1, min_solidity=0.85):
+    """The filter as it was before it was vectorized, with the solidity bound
+    made an argument."""
+    trash = []
+    if scale == 1:
+        contours = cv2.findContours(
+            bitmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset
+        )
+        contours = imutils.grab_contours(contours)
+    else:
+        contours = cv2.findContours(bitmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        shift = np.array(offset, dtype=np.int32) + scale // 2
+        contours = [c * scale + shift for c in imutils.grab_contours(contours)]
+    convex_hulls = [cv2.convexHull(contour) for contour in contours]
+    contour_hull_areas = [cv2.contourArea(hull) for hull in convex_hulls]
+
+    left_edge, top_edge = offset
+    right_edge = left_edge + bitmask.shape[1] * scale
+    bottom_edge = top_edge + bitmask.shape[0] * scale
+
+    def not_touching_edge(cnt):
+        cnt = cnt.reshape((-1, 2))
+        top_index = cnt[:, 1].argmin()
+        bottom_index = cnt[:, 1].argmax()
+        left_index = cnt[:, 0].argmin()
+        right_index = cnt[:, 0].argmax()
+
+        top_y = cnt[top_index][1]
+        bot_y = cnt[bottom_index][1]
+        left_x = cnt[left_index][0]
+        right_x = cnt[right_index][0]
+
+        return (
+            top_y > top_edge + 10
+            and bot_y < bottom_edge - 10
+            and left_x > left_edge + 10
+            and right_x < right_edge - 10
+        )
+
+    is_candidate = []
+    for contour, contour_hull_area in zip(contours, contour_hull_areas):
+        if contour_hull_area > 10:
+            area = cv2.contourArea(contour)
+            if area / contour_hull_area > min_solidity:
+                _, _, w, h = cv2.boundingRect(contour)
+                ratio = (
+                    -constants.VISION_TAPE_ROTATED_WIDTH_FT
+                    / constants.VISION_TAPE_ROTATED_HEIGHT_FT
+                )
+                if 0.5 * ratio <= w / h <= 1.5 * ratio:
+                    if not_touching_edge(contour):
+                        is_candidate.append(True)
+                        continue
+        is_candidate.append(False)
+        trash.append(contour)
+
+    candidates = [
+        convex_hulls[i] for i, contour in enumerate(contours) if is_candidate[i]
+    ]
+    return candidates, trash
+
+
+def tape(mask, center, angle=14.5, size=(20, 55)):
+    corners = cv2.boxPoints((center, size, angle))
+    cv2.fillPoly(mask, [np.round(corners).astype(np.int32)], 255)
+
+
+def empty():
+    return np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+
+
+def one():
+    mask = empty()
+    tape(mask, (100, 120))
+    return mask
+
+
+def pair():
+    mask = empty()
+    tape(mask, (120, 120), 14.5)
+    tape(mask, (200, 120), -14.5)
+    return mask
+
+
+def ties():
+    # the same x extremes, stacked
+    mask = empty()
+    tape(mask, (160, 60))
+    tape(mask, (160, 170))
+    return mask
+
+
+def edges():
+    # flush with, 5 px and 12 px from each edge
+    mask = empty()
+    for inset in (0, 5, 12):
+        tape(mask, (inset + 8, 40 + inset * 12), 0, (16, 30))
+        tape(mask, (WIDTH - inset - 9, 40 + inset * 12), 0, (16, 30))
+        tape(mask, (60 + inset * 5, inset + 15), 0, (16, 30))
+        tape(mask, (180 + inset * 5, HEIGHT - inset - 16), 0, (16, 30))
+    return mask
+
+
+def concave():
+    # shaped like tape from the outside, but covering too little of their hull
+    mask = empty()
+    for x, thickness in ((60, 4), (140, 8), (220, 12)):
+        cv2.rectangle(mask, (x, 60), (x + thickness, 160), 255, -1)
+        cv2.rectangle(mask, (x, 160 - thickness), (x + 55, 160), 255, -1)
+    return mask
+
+
+def noise():
+    rng = np.random.RandomState(0)
+    mask = empty()
+    for x in range(30, WIDTH - 30, 40):
+        tape(mask, (x, rng.uniform(40, HEIGHT - 40)), rng.choice((-14.5, 14.5)))
+    for _ in range(20):
+        center = tuple(rng.uniform((0, 0), (WIDTH, HEIGHT)))
+        size = tuple(rng.uniform(1, 30, 2))
+        tape(mask, center, rng.uniform(-90, 90), size)
+    mask[rng.uniform(size=mask.shape) > 0.995] = 255
+    return mask
+
+
+def mixed():
+    # rejected before and after the hull is built, in between tapes
+    mask = concave()
+    for x in (40, 110, 190, 270):
+        tape(mask, (x, 200), 14.5, (12, 30))
+        cv2.circle(mask, (x, 30), 3, 255, -1)
+    return mask
+
+
+MASKS = {
+    "empty": empty,
+    "one": one,
+    "pair": pair,
+    "ties": ties,
+    "edges": edges,
+    "concave": concave,
+    "mixed": mixed,
+    "noise": noise,
+}
+
+
+@pytest.fixture(scope="module")
+def tape_pipeline():
+    return pipeline.TapePipeline(constants.CALIBRATION_FILE_LOCATION)
+
+
+def assert_same_contours(actual, expected):
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        np.testing.assert_array_equal(a, e)
+
+
+@pytest.mark.parametrize("name", sorted(MASKS))
+@pytest.mark.parametrize("offset, scale", [((0, 0), 1), ((40, 30), 1), ((8, 6), 2)])
+def test_filter_matches_reference(tape_pipeline, name, offset, scale):
+    bitmask = MASKS[name]()
+    min_solidity = (
+        pipeline.MIN_SOLIDITY if scale == 1 else pipeline.DOWNSCALED_MIN_SOLIDITY
+    )
+    candidates, trash = tape_pipeline.filter_candidates(bitmask, offset, scale)
+    expected = reference_filter(bitmask, offset, scale, min_solidity)
+
+    assert_same_contours(candidates, expected[0])
+    assert_same_contours(trash, expected[1])
+
+
+@pytest.mark.parametrize(
+    "name, count",
+    [
+        ("empty", 0),
+        ("one", 1),
+        ("pair", 2),
+        ("ties", 2),
+        ("edges", 4),
+        ("concave", 0),
+        ("mixed", 4),
+    ],
+)
+def test_filter_finds_tape(tape_pipeline, name, count):
+    candidates, _ = tape_pipeline.filter_candidates(MASKS[name]())
+    assert len(candidates) == count
@@ -0,0 +1,171 @@
+"""Tape pairing has to find the real targets among distractor contours, and the
+pipeline has to keep following the target the tracker expects."""
+
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from frc2019_vision.vision import constants, pairing, pipeline
+from frc2019_vision.vision.camera import camera_model
+from frc2019_vision.vision.synthetic import (
+    TARGET_LEFT_TAPE,
+    TARGET_RIGHT_TAPE,
+    _OUTLINE,
+    SceneGenerator,
+)
+from frc2019_vision.vision.tracker import TrackedPose
+
+
+WIDTH = 640
+HEIGHT = 480
+
+
+def tape(mask, center, angle=14.5, size=(20, 55)):
+    corners = cv2.boxPoints((center, size, angle))
+    cv2.fillPoly(mask, [np.round(corners).astype(np.int32)], 255)
+
+
+def target(mask, x, y=240):
+    # tapes 55 px long are about 58 px tall, spaced like on the field
+    spacing = pairing.EXPECTED_SPACING * 58
+    tape(mask, (x - spacing / 2, y), 14.5)
+    tape(mask, (x + spacing / 2, y), -14.5)
+
+
+def empty():
+    return np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+
+
+@pytest.fixture
+def tape_pipeline():
+    tape_pipeline = pipeline.TapePipeline(constants.CALIBRATION_FILE_LOCATION)
+    tape_pipeline.width, tape_pipeline.height = WIDTH, HEIGHT
+    return tape_pipeline
+
+
+def pairs_in(tape_pipeline, mask):
+    candidates, _ = tape_pipeline.filter_candidates(mask)
+    return pairing.pair_tapes(candidates)
+
+
+@pytest.mark.parametrize("angle, size", [(-28, (16, 55)), (-4, (20, 55))])
+def test_stray_lean_is_not_paired(tape_pipeline, angle, size):
+    # a lone tape and a contour leaning too much or too little to be its partner
+    mask = empty()
+    tape(mask, (200, 240), 14.5)
+    tape(mask, (200 + pairing.EXPECTED_SPACING * 58, 240), angle, size)
+    assert pairs_in(tape_pipeline, mask) == []
+
+
+def test_target_among_distractors(tape_pipeline):
+    mask = empty()
+    target(mask, 320)
+    # a lone tape with a stray partner leaning too much
+    tape(mask, (480, 240), 14.5)
+    tape(mask, (480 + pairing.EXPECTED_SPACING * 58, 240), -28, (16, 55))
+    tape(mask, (100, 240), -4)
+    tape(mask, (320, 100), 14.5)
+    cv2.circle(mask, (450, 380), 20, 255, -1)
+    cv2.ellipse(mask, (150, 400), (12, 30), 15, 0, 360, 255, -1)
+
+    pairs = pairs_in(tape_pipeline, mask)
+    assert len(pairs) == 1
+    assert pairs[0].centroid_x == pytest.approx(320, abs=2)
+
+
+def is_target(generator, frame, pair):
+    """Whether the pair is the left and right tape of the same target."""
+    for target_pose in frame.targets:
+        tapes = (TARGET_LEFT_TAPE, TARGET_RIGHT_TAPE)
+        if all(
+            cv2.pointPolygonTest(
+                generator.project(tape[_OUTLINE], target_pose).astype(np.float32),
+                tuple(float(v) for v in hull.reshape(-1, 2).mean(axis=0)),
+                False,
+            )
+            >= 0
+            for tape, hull in zip(tapes, (pair.left, pair.right))
+        ):
+            return True
+    return False
+
+
+def test_synthetic_distractors(tape_pipeline):
+    calibration = pipeline.load_calibration_results(constants.CALIBRATION_FILE_LOCATION)
+    generator = SceneGenerator(
+        calibration,
+        targets_range=(1, 3),
+        distractors_range=(0, 40),
+        noise=12,
+        motion_blur=3,
+        seed=5,
+    )
+    real = false = 0
+    for frame in generator.frames(60):
+        bitmask = tape_pipeline.generate_bitmask_camera(frame.image)
+        for pair in pairs_in(tape_pipeline, bitmask):
+            if is_target(generator, frame, pair):
+                real += 1
+            else:
+                false += 1
+    assert real > 20
+    assert false <= 0.1 * (real + false)
+
+
+def prediction(tape_pipeline, x, height):
+    """The tracker's pose of a target centered on column ``x`` whose tapes are
+    ``height`` pixels tall."""
+    camera = camera_model(tape_pipeline.calibration_info, (WIDTH, HEIGHT))
+    distance = (
+        camera.camera_matrix[1, 1] * -constants.VISION_TAPE_ROTATED_HEIGHT_FT / height
+    )
+    offset = distance * math.tan(math.radians(float(camera.yaw(x))))
+    return TrackedPose(distance, 0.0, offset, 0.0)
+
+
+def two_targets():
+    mask = empty()
+    target(mask, 150)
+    target(mask, 400)
+    return mask
+
+
+def centroid_x(contours):
+    return np.concatenate(contours).reshape(-1, 2)[:, 0].mean()
+
+
+def test_nearest_to_center_without_prediction(tape_pipeline):
+    contours, _ = tape_pipeline.get_contours(two_targets())
+    assert centroid_x(contours) == pytest.approx(400, abs=2)
+
+
+def test_follows_prediction(tape_pipeline):
+    tape_pipeline.prediction = prediction(tape_pipeline, 160, 58)
+    contours, _ = tape_pipeline.get_contours(two_targets())
+    assert centroid_x(contours) == pytest.approx(150, abs=2)
+
+
+@pytest.mark.parametrize("x, height", [(275, 58), (150, 29), (150, 116)])
+def test_nothing_near_prediction(tape_pipeline, x, height):
+    # between the targets, or a target twice as far or half as far as predicted
+    tape_pipeline.prediction = prediction(tape_pipeline, x, height)
+    contours, trash = tape_pipeline.get_contours(two_targets())
+    assert contours == []
+    assert len(tape_pipeline.pairs) == 2
+    assert len(trash) == 4
+
+
+def test_targets_visible_without_tracked_one(tape_pipeline):
+    calibration = pipeline.load_calibration_results(constants.CALIBRATION_FILE_LOCATION)
+    frame = next(SceneGenerator(calibration, seed=3).frames(1))
+    seen = frame.targets[0]
+    tape_pipeline.prediction = TrackedPose(seen.distance, 0.0, seen.offset + 3, 0.0)
+
+    _, distance, _, _ = tape_pipeline.measure(frame.image)
+    assert distance is None
+    assert len(tape_pipeline.visible_targets) == 1
+    assert tape_pipeline.visible_targets[0].distance == pytest.approx(
+        seen.distance, rel=0.05
+    )
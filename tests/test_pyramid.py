@@ -0,0 +1,53 @@
+"""Pyramid mode has to find the same targets, at the same pose, as a full
+resolution search."""
+
+import pytest
+
+from frc2019_vision.vision import constants, pipeline
+from frc2019_vision.vision.synthetic import SceneGenerator
+
+
+FRAMES = 40
+
+DISTANCE_TOLERANCE = 0.05
+"""Feet"""
+ANGLE_TOLERANCE = 1.0
+"""Degrees"""
+OFFSET_TOLERANCE = 0.05
+"""Feet"""
+
+
+@pytest.fixture(scope="module")
+def frames():
+    generator = SceneGenerator(
+        pipeline.load_calibration_results(constants.CALIBRATION_FILE_LOCATION),
+        seed=0,
+    )
+    return [frame.image for frame in generator.frames(FRAMES) if frame.targets]
+
+
+def measure(frames, scale):
+    tape_pipeline = pipeline.TapePipeline(
+        constants.CALIBRATION_FILE_LOCATION, scale=scale
+    )
+    return [tape_pipeline.measure(frame)[1:] for frame in frames]
+
+
+@pytest.mark.parametrize("scale, min_found", [(2, 1.0), (4, 0.95)])
+def test_pyramid_matches_full_resolution(frames, scale, min_found):
+    full = measure(frames, 1)
+    pyramid = measure(frames, scale)
+
+    found = sum(distance is not None for distance, _, _ in full)
+    assert found > len(frames) * 0.8
+    both = [
+        (expected, measured)
+        for expected, measured in zip(full, pyramid)
+        if expected[0] is not None and measured[0] is not None
+    ]
+    assert len(both) >= found * min_found
+
+    for (distance, angle, offset), measured in both:
+        assert measured[0] == pytest.approx(distance, abs=DISTANCE_TOLERANCE)
+        assert measured[1] == pytest.approx(angle, abs=ANGLE_TOLERANCE)
+        assert measured[2] == pytest.approx(offset, abs=OFFSET_TOLERANCE)